@@ -1,5 +1,6 @@
 """Module docstring text"""
 __version__ = 'v1.2.1'
 
+from . import cache
 from . import toolbox
 from . import visualization
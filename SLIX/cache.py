@@ -0,0 +1,254 @@
+"""
+Content-addressed on-disk cache for intermediate results like roisets and peak tables. Each cache entry is a directory
+named after its key containing one .npy file per array. Entries are loaded with memory mapping, so parts of large
+entries can be used without reading the whole entry. When the cache exceeds its size limit, the least recently used
+entries are removed.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy
+
+# Default size limit of a cache directory in bytes
+CACHE_SIZE = 10 * 1024 ** 3
+# Number of bytes read at once while hashing a file
+HASH_BLOCK_SIZE = 16 * 1024 ** 2
+TEMPORARY_PREFIX = '.tmp-'
+# Version of the cached results. Has to be increased whenever the evaluation changes its results, so that cache
+# entries created by an earlier version are not used anymore.
+CACHE_VERSION = 2
+# Hashes of the files which were already hashed by this process together with their size and modification time
+_file_hashes = {}
+
+
+def file_hash(path):
+    """
+    Calculate the SHA-256 hash of the content of a file. Renaming or moving a measurement therefore does not
+    invalidate its cache entries. Each file is only hashed once per process as long as its size and modification time
+    do not change.
+
+    Arguments:
+        path: Path of the file
+
+    Returns:
+        Hexadecimal string of the hash
+    """
+    status = os.stat(path)
+    file_state = (os.path.realpath(path), status.st_size, status.st_mtime_ns)
+    if file_state not in _file_hashes:
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                sha256.update(block)
+        _file_hashes[file_state] = sha256.hexdigest()
+    return _file_hashes[file_state]
+
+
+def cache_key(*parts):
+    """
+    Create the key of a cache entry from all values the cached result depends on, e.g. the hash of the input file and
+    the parameters used for the evaluation.
+
+    Arguments:
+        *parts: Strings, numbers, booleans, None or tuples of them
+
+    Returns:
+        Hexadecimal string which can be used as key for 'load' and 'store'
+    """
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+def load(directory, key):
+    """
+    Load a cache entry. The arrays are memory-mapped read-only. Loading an entry marks it as recently used.
+
+    Arguments:
+        directory: Cache directory
+        key: Key of the cache entry (see 'cache_key')
+
+    Returns:
+        Dictionary with the names and arrays of the entry or None if the entry does not exist
+    """
+    path = os.path.join(directory, key)
+    if not os.path.isdir(path):
+        return None
+    try:
+        arrays = {os.path.splitext(name)[0]: numpy.load(os.path.join(path, name), mmap_mode='r')
+                  for name in os.listdir(path) if name.endswith('.npy')}
+        os.utime(path)
+    except (FileNotFoundError, ValueError):
+        # The entry was evicted or is damaged
+        return None
+    return arrays
+
+
+def contains(directory, key):
+    """
+    Check whether a cache entry exists without loading it.
+
+    Arguments:
+        directory: Cache directory
+        key: Key of the cache entry (see 'cache_key')
+
+    Returns:
+        True if the entry exists
+    """
+    return os.path.isdir(os.path.join(directory, key))
+
+
+def store(directory, key, arrays, max_size=CACHE_SIZE):
+    """
+    Store arrays as cache entry and remove the least recently used entries if the cache exceeds max_size afterwards.
+    The entry is written to a temporary directory first so that other processes never load incomplete entries.
+
+    Arguments:
+        directory: Cache directory. It will be created if it does not exist.
+        key: Key of the cache entry (see 'cache_key')
+        arrays: Dictionary with the names and arrays which will be stored
+        max_size: Size limit of the cache directory in bytes
+
+    Returns: None
+    """
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = tempfile.mkdtemp(prefix=TEMPORARY_PREFIX, dir=directory)
+    try:
+        for name, array in arrays.items():
+            numpy.save(os.path.join(temporary_path, name + '.npy'), numpy.asarray(array))
+    except BaseException:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        raise
+    _publish(directory, key, temporary_path)
+    evict(directory, max_size)
+
+
+def _publish(directory, key, temporary_path):
+    """
+    Move a completely written entry from its temporary directory to its key.
+    """
+    try:
+        os.rename(temporary_path, os.path.join(directory, key))
+    except OSError:
+        # Another process stored the same entry in the meantime
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        if not os.path.isdir(os.path.join(directory, key)):
+            raise
+
+
+class EntryWriter:
+    """
+    Write a cache entry part by part, e.g. band by band while a measurement is evaluated. The parts of each array are
+    concatenated along their first axis. Like 'store', the entry is written to a temporary directory and only becomes
+    visible when it is finished, so other processes never load incomplete entries.
+
+    Arguments:
+        directory: Cache directory. It will be created if it does not exist.
+        key: Key of the cache entry (see 'cache_key')
+        max_size: Size limit of the cache directory in bytes
+    """
+
+    def __init__(self, directory, key, max_size=CACHE_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.key = key
+        self.max_size = max_size
+        self.temporary_path = tempfile.mkdtemp(prefix=TEMPORARY_PREFIX, dir=directory)
+        # Data type, shape of one row and number of rows of each array
+        self.layouts = {}
+
+    def append(self, arrays):
+        """
+        Append the next part of each array to the entry.
+
+        Arguments:
+            arrays: Dictionary with the names and arrays. The arrays have to keep their data type and the size of all
+            but the first axis across all parts.
+
+        Returns: None
+        """
+        for name, array in arrays.items():
+            array = numpy.ascontiguousarray(array)
+            dtype, row_shape, rows = self.layouts.get(name, (array.dtype, array.shape[1:], 0))
+            if array.dtype != dtype or array.shape[1:] != row_shape:
+                raise ValueError('The parts of ' + name + ' have to keep their data type and shape.')
+            with open(os.path.join(self.temporary_path, name + '.part'), 'ab') as file:
+                array.tofile(file)
+            self.layouts[name] = (dtype, row_shape, rows + array.shape[0])
+
+    def finish(self, arrays=None):
+        """
+        Convert the appended parts into the arrays of the entry and store it. Afterwards, the least recently used
+        entries are removed if the cache exceeds max_size.
+
+        Arguments:
+            arrays: Dictionary with the names and arrays which will be stored as they are in addition to the appended
+            arrays, e.g. parameters of the evaluation.
+
+        Returns: None
+        """
+        try:
+            for name, (dtype, row_shape, rows) in self.layouts.items():
+                part_path = os.path.join(self.temporary_path, name + '.part')
+                array = numpy.lib.format.open_memmap(os.path.join(self.temporary_path, name + '.npy'), mode='w+',
+                                                     dtype=dtype, shape=(rows,) + row_shape)
+                if array.size > 0:
+                    # The parts are copied page by page instead of reading them into memory at once
+                    array[:] = numpy.memmap(part_path, dtype=dtype, mode='r', shape=array.shape)
+                    array.flush()
+                del array
+                os.remove(part_path)
+            for name, array in (arrays or {}).items():
+                numpy.save(os.path.join(self.temporary_path, name + '.npy'), numpy.asarray(array))
+        except BaseException:
+            self.abort()
+            raise
+        _publish(self.directory, self.key, self.temporary_path)
+        evict(self.directory, self.max_size)
+
+    def abort(self):
+        """
+        Discard the entry.
+
+        Returns: None
+        """
+        shutil.rmtree(self.temporary_path, ignore_errors=True)
+
+
+def entry_size(directory, key):
+    """
+    Arguments:
+        directory: Cache directory
+        key: Key of the cache entry
+
+    Returns:
+        Size of the cache entry in bytes
+    """
+    path = os.path.join(directory, key)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def evict(directory, max_size=CACHE_SIZE):
+    """
+    Remove the least recently used cache entries until the size of the cache directory is at most max_size.
+
+    Arguments:
+        directory: Cache directory
+        max_size: Size limit of the cache directory in bytes
+
+    Returns: None
+    """
+    entries = []
+    for key in os.listdir(directory):
+        if key.startswith(TEMPORARY_PREFIX) or not os.path.isdir(os.path.join(directory, key)):
+            continue
+        try:
+            entries.append((os.path.getmtime(os.path.join(directory, key)), entry_size(directory, key), key))
+        except FileNotFoundError:
+            continue
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, key in sorted(entries):
+        if total_size <= max_size:
+            break
+        shutil.rmtree(os.path.join(directory, key), ignore_errors=True)
+        total_size -= size
@@ -1,23 +1,238 @@
+import concurrent.futures
 import multiprocessing
+import os
+import queue
+import threading
 
 import nibabel
 import numpy
 import pymp
 import tifffile
 import tqdm
-import time
 from scipy.signal import peak_widths, savgol_filter, find_peaks, peak_prominences
 
+try:
+    import numba
+except ImportError:
+    numba = None
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
 pymp.config.nested = True
 
 # DEFAULT PARAMETERS
 BACKGROUND_COLOR = -1
 CPU_COUNT = min(16, multiprocessing.cpu_count())
+# Execution backend used for parallel computations. 'process' forks CPU_COUNT processes working on shared memory,
+# 'thread' uses a pool of CPU_COUNT threads and 'serial' runs everything in the calling thread.
+EXECUTION_BACKEND = 'process'
+EXECUTION_BACKENDS = ('process', 'thread', 'serial')
 MAX_DISTANCE_FOR_CENTROID_ESTIMATION = 2
 
+# Compile the search for peak bases and peak width intersections with Numba if it is installed. Otherwise, or if set
+# to False, all peaks are processed with NumPy array operations instead. Both give exactly the same results. Only these
+# two searches are compiled: their number of steps depends on the line profile, so the NumPy version needs one pass
+# over the remaining peaks per step. Peak detection, centroid correction and the direction and distance maps already
+# take a fixed number of array operations for the whole roiset and stay NumPy code.
+USE_NUMBA = numba is not None
+CHUNK_SIZE = 1000
+# Estimated memory usage of the intermediate results for each point of a line profile while evaluating a chunk
+BYTES_PER_CHUNK_SAMPLE = 128
 NUMBER_OF_SAMPLES = 100
 TARGET_PEAK_HEIGHT = 0.94
 TARGET_PROMINENCE = 0.08
+# Parameter maps which can be generated with 'parameter_maps_image' in the order of the SLIXParameterGenerator
+PARAMETER_MAPS = ('max', 'min', 'avg', 'low_prominence_peaks', 'high_prominence_peaks', 'peakwidth', 'peakprominence',
+                  'peakdistance', 'non_crossing_dir', 'dir')
+# Size of the square tiles of the parameter map containers written by 'write_parameter_maps'
+PARAMETER_MAP_TILE_SIZE = 256
+
+
+def _check_backend(backend):
+    if backend is None:
+        backend = EXECUTION_BACKEND
+    if backend not in EXECUTION_BACKENDS:
+        raise ValueError('Unknown execution backend ' + str(backend) + '. Expected one of ' + str(EXECUTION_BACKENDS) +
+                         '.')
+    return backend
+
+
+def _check_parameter_maps(parameter_maps):
+    for name in parameter_maps:
+        if name not in PARAMETER_MAPS:
+            raise ValueError('Unknown parameter map ' + str(name) + '. Expected one of ' + str(PARAMETER_MAPS) + '.')
+
+
+def shared_array(shape, dtype, backend=None):
+    """
+    Create an array filled with zeros which can be written by all workers of the given execution backend.
+
+    Parameters
+    ----------
+    shape: Shape of the array.
+    dtype: Data type of the array.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
+
+    Returns
+    -------
+    NumPy array in shared memory for the 'process' backend or a regular NumPy array otherwise.
+    """
+    if _check_backend(backend) == 'process':
+        return pymp.shared.array(shape, dtype=dtype)
+    return numpy.zeros(shape, dtype=dtype)
+
+
+def null_progress(stage, done, total):
+    """
+    Progress callback which ignores all events. Passing it as progress callback disables the progress reporting
+    completely, i.e. no progress will be counted at all.
+    """
+    pass
+
+
+def tqdm_progress():
+    """
+    Create a progress callback which shows a tqdm progress bar for each stage.
+
+    Returns
+    -------
+    Function which can be used as progress callback.
+    """
+    progress_bars = {}
+
+    def callback(stage, done, total):
+        if stage not in progress_bars:
+            progress_bars[stage] = tqdm.tqdm(total=total, desc=stage)
+        pbar = progress_bars[stage]
+        pbar.update(done - pbar.n)
+        if done >= total:
+            pbar.close()
+            del progress_bars[stage]
+
+    return callback
+
+
+# Progress callback which will be called with the events (stage, done, total) of all parallel computations if no
+# other callback is given. Set this to null_progress to disable the progress bars.
+PROGRESS_CALLBACK = tqdm_progress()
+
+
+def parallel_for(function, start, stop, step=1, backend=None, stage=None, progress_callback=None):
+    """
+    Call function(index) for each index in range(start, stop, step) using the selected execution backend.
+    The function has to write its results into arrays created with 'shared_array'.
+
+    Parameters
+    ----------
+    function: Function which will be called with the index of each work item.
+    start: First index.
+    stop: Stop index (exclusive).
+    step: Step between two indices. Each work item covers the indices up to the next one.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
+    stage: Name of the computation which is reported to the progress callback. If None, no progress is reported.
+    progress_callback: Function which will be called with (stage, done, total) where done and total count the
+    finished and all indices. Events are always emitted from the calling process. If None, PROGRESS_CALLBACK will be
+    used.
+
+    Returns
+    -------
+    None
+    """
+    backend = _check_backend(backend)
+    if progress_callback is None:
+        progress_callback = PROGRESS_CALLBACK
+    if stage is None or progress_callback is None or progress_callback is null_progress:
+        progress_callback = None
+    indices = range(start, stop, step)
+    total = max(stop - start, 0)
+    if progress_callback is not None:
+        progress_callback(stage, 0, total)
+
+    if backend == 'serial':
+        for index in indices:
+            function(index)
+            if progress_callback is not None:
+                progress_callback(stage, min(index + step, stop) - start, total)
+    elif backend == 'thread':
+        with concurrent.futures.ThreadPoolExecutor(CPU_COUNT) as executor:
+            futures = {executor.submit(function, index): index for index in indices}
+            done = 0
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+                if progress_callback is not None:
+                    done += min(step, stop - futures[future])
+                    progress_callback(stage, done, total)
+    else:
+        if progress_callback is not None:
+            number_of_finished_items = pymp.shared.array(CPU_COUNT, dtype=numpy.int64)
+        done = 0
+        with pymp.Parallel(CPU_COUNT) as p:
+            for index in p.range(start, stop, step):
+                function(index)
+                if progress_callback is not None:
+                    number_of_finished_items[p.thread_num] += min(step, stop - index)
+                    # Only the calling process reports the progress of all processes.
+                    if p.thread_num == 0:
+                        done = int(numpy.sum(number_of_finished_items))
+                        progress_callback(stage, done, total)
+        # The remaining progress is reported as soon as all processes are finished.
+        if progress_callback is not None and done < total:
+            progress_callback(stage, total, total)
+
+
+def prefetch(iterable, depth=1):
+    """
+    Iterate over the given iterable while a background thread already computes the next items, e.g. to read the next
+    band of a measurement from disk while the current band is evaluated. Exceptions of the iterable are raised in
+    the calling thread. Do not combine it with the 'process' backend: forking the workers while the background
+    thread holds a lock (e.g. of the file being read) could deadlock them.
+
+    Parameters
+    ----------
+    iterable: Iterable whose items will be computed in the background thread.
+    depth: Number of finished items which are held back at most. As the background thread computes another item
+    while waiting, up to depth + 1 items are in memory in addition to the current one.
+
+    Returns
+    -------
+    Generator yielding the items of the iterable in their original order.
+    """
+    items = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item):
+        # Give up as soon as the consumer stopped iterating. Otherwise, the thread would wait forever.
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+            put((False, None))
+        except BaseException as error:
+            put((False, error))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            has_item, item = items.get()
+            if not has_item:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stopped.set()
 
 
 def all_peaks(line_profile, cut_edges=True):
@@ -51,7 +266,57 @@ def all_peaks(line_profile, cut_edges=True):
     return maxima
 
 
-def num_peaks_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True):
+def all_peaks_roiset(roiset, cut_edges=True):
+    """
+    Detect all peaks of every line profile in a roiset at once. This is the vectorized counterpart of 'all_peaks' and
+    returns exactly the same peaks, including plateaus (the middle of a flat peak is used, rounded down) and the
+    filtering of the double peak when using cut_edges.
+
+    Parameters
+    ----------
+    roiset: 2D-NumPy array with the shape (number of pixels, number of points in one line profile).
+    cut_edges: If True, only consider peaks within the second third of all detected peaks.
+
+    Returns
+    -------
+    Boolean NumPy array with the same shape as the roiset. Entries are True at the positions of all detected peaks.
+    """
+    roiset = numpy.asarray(roiset)
+    number_of_pixels, profile_length = roiset.shape
+    number_of_measurements = profile_length // 2
+    peak_mask = numpy.zeros(roiset.shape, dtype=bool)
+    if profile_length < 3:
+        return peak_mask
+
+    rising = roiset[:, 1:] > roiset[:, :-1]
+    falling = roiset[:, 1:] < roiset[:, :-1]
+    # For every slope, find the next slope which is not flat. This allows the detection of plateaus.
+    slope_index = numpy.where(rising | falling, numpy.arange(profile_length - 1, dtype=numpy.int32),
+                              profile_length - 1).astype(numpy.int32)
+    next_slope = numpy.minimum.accumulate(slope_index[:, ::-1], axis=1)[:, ::-1]
+    next_slope = numpy.concatenate((next_slope[:, 1:], numpy.full((number_of_pixels, 1), profile_length - 1,
+                                                                  dtype=numpy.int32)), axis=1)
+    padded_falling = numpy.concatenate((falling, numpy.zeros((number_of_pixels, 1), dtype=bool)), axis=1)
+    next_slope_falling = numpy.take_along_axis(padded_falling, next_slope, axis=1)
+    pixel, left_edge = numpy.nonzero(rising & next_slope_falling)
+    peak_mask[pixel, (left_edge + 1 + next_slope[pixel, left_edge]) // 2] = True
+
+    # Only consider peaks which are in bounds
+    if cut_edges:
+        lower_bound = number_of_measurements // 2
+        upper_bound = profile_length - number_of_measurements // 2
+        peak_mask[:, :lower_bound] = False
+        peak_mask[:, upper_bound + 1:] = False
+        # Filter double peak
+        if upper_bound < profile_length:
+            double_peak = peak_mask[:, lower_bound] & peak_mask[:, upper_bound]
+            peak_mask[double_peak, lower_bound] = False
+
+    return peak_mask
+
+
+def num_peaks_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True,
+                    backend=None):
     """
     Calculate the number of peaks from each line profile in an SLI image series by detecting all peaks and applying thresholds to
     remove unwanted peaks.
@@ -62,40 +327,15 @@ def num_peaks_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=nu
     low_prominence: Lower prominence bound for detecting a peak.
     high_prominence: Higher prominence bound for detecting a peak.
     cut_edges: If True, only consider peaks within the second third of all detected peaks.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
 
     Returns
     -------
     NumPy array where each entry corresponds to the number of detected peaks within the first dimension of the SLI image series.
     """
-    return_value = pymp.shared.array((roiset.shape[0], 1), dtype=numpy.int32)
-    pbar = tqdm.tqdm(total=len(roiset), desc='Number of peaks')
-    number_of_finished_pixels = pymp.shared.array(CPU_COUNT, dtype=numpy.long)
-    last_sum_of_finished_pixels = 0
-    active_cores = pymp.shared.array(CPU_COUNT, dtype=numpy.bool)
-    active_cores[:] = True
-
-    with pymp.Parallel(CPU_COUNT) as p:
-        number_of_finished_pixels[p.thread_num] = 0
-        for i in p.range(0, len(roiset)):
-            roi = roiset[i]
-            peaks = all_peaks(roi, cut_edges)
-            return_value[i] = len(accurate_peak_positions(peaks, roi, low_prominence, high_prominence, False))
-            number_of_finished_pixels[p.thread_num] += 1
-            if p.thread_num == 0 and number_of_finished_pixels[p.thread_num] % 1000 == 0:
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-        # When one core has finished, mark it. As long as not all threads are finished continue to update the
-        # progress bar.
-        active_cores[p.thread_num] = False
-        if p.thread_num == 0:
-            while numpy.any(active_cores == True):
-                time.sleep(0.5)
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-            pbar.close()
-    return return_value
+    # The parameter maps are calculated as floating point values. The number of peaks keeps its integer type.
+    return parameter_maps_image(roiset, ['high_prominence_peaks'], low_prominence, high_prominence, cut_edges,
+                                False, backend=backend)['high_prominence_peaks'].astype('int32')
 
 
 def accurate_peak_positions(peak_positions, line_profile, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf,
@@ -129,6 +369,76 @@ def accurate_peak_positions(peak_positions, line_profile, low_prominence=TARGET_
     return selected_peaks
 
 
+def accurate_peak_positions_roiset(peak_mask, roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf,
+                                   centroid_calculation=True):
+    """
+    Post-processing method after peaks have been calculated using the 'all_peaks_roiset' method. This is the
+    counterpart of 'accurate_peak_positions' for all line profiles of a roiset at once.
+
+    Parameters
+    ----------
+    peak_mask: Detected peaks of the 'all_peaks_roiset' method.
+    roiset: Original line profiles used to detect all peaks.
+    low_prominence: Lower prominence bound for detecting a peak.
+    high_prominence: Higher prominence bound for detecting a peak.
+    centroid_calculation: Use centroid calculation to better determine the peak position regardless of the number of
+    measurements / illumination angles used.
+
+    Returns
+    -------
+    Boolean NumPy array marking the selected peaks and a NumPy array with the same shape containing the position of
+    each selected peak. All other entries of the position array are zero.
+    """
+    n_roiset = normalize_roiset(roiset)
+    peak_prominence = peak_prominences_roiset(n_roiset, peak_mask)[0]
+    selected_peaks = peak_mask & (peak_prominence > low_prominence) & (peak_prominence < high_prominence)
+
+    if centroid_calculation:
+        return selected_peaks, centroid_correction_roiset(n_roiset, selected_peaks, low_prominence, high_prominence)
+
+    peak_positions = numpy.where(selected_peaks, numpy.arange(n_roiset.shape[-1]), 0).astype(numpy.float32)
+    return selected_peaks, peak_positions
+
+
+def padded_peak_positions(peak_mask, peak_positions=None, fill_value=BACKGROUND_COLOR):
+    """
+    Convert the peaks of a roiset into a padded peak position matrix where each row contains the sorted peak positions
+    of one line profile. This is the input of the direction and peak distance kernels working on whole roisets.
+
+    Parameters
+    ----------
+    peak_mask: Boolean NumPy array marking the peaks of each line profile, e.g. the result of 'all_peaks_roiset'.
+    peak_positions: NumPy array with the same shape as the peak mask containing the (corrected) peak positions,
+    e.g. the result of 'accurate_peak_positions_roiset'. If None, the indices of the peaks will be used.
+    fill_value: Value of all entries which do not correspond to a peak.
+
+    Returns
+    -------
+    NumPy array with the shape (number of pixels, maximum number of peaks but at least two) and the number of peaks of
+    each line profile.
+    """
+    num_peaks = numpy.count_nonzero(peak_mask, axis=-1)
+    pixel, peak = numpy.nonzero(peak_mask)
+    if peak_positions is None:
+        values = peak
+    else:
+        values = numpy.asarray(peak_positions)[pixel, peak]
+    return _pad_peak_values(pixel, values, num_peaks, fill_value), num_peaks
+
+
+def _pad_peak_values(pixel, values, num_peaks, fill_value):
+    """
+    Distribute the values of peaks sorted by their pixel into a padded matrix with one row per pixel.
+    """
+    # At least two columns are needed by the kernels even if no line profile contains two peaks.
+    padded_values = numpy.full((len(num_peaks), max(num_peaks.max(initial=0), 2)) + values.shape[1:], fill_value,
+                               dtype=values.dtype)
+    # Subtracting the index of the first peak of each pixel yields the column.
+    first_peak = numpy.concatenate(([0], numpy.cumsum(num_peaks)[:-1]))
+    padded_values[pixel, numpy.arange(len(pixel)) - first_peak[pixel]] = values
+    return padded_values
+
+
 def peakdistance(peak_positions, number_of_measurements):
     """
     Calculate the mean peak distance in degrees between two corresponding peaks within a line profile.
@@ -160,13 +470,48 @@ def peakdistance(peak_positions, number_of_measurements):
         return BACKGROUND_COLOR
 
 
+def peakdistance_roiset(peak_positions, num_peaks, number_of_measurements):
+    """
+    Calculate the mean peak distance in degrees between two corresponding peaks for all line profiles of a roiset at
+    once. This is the counterpart of 'peakdistance' working on a padded peak position matrix.
+
+    Parameters
+    ----------
+    peak_positions: Padded peak position matrix of the 'padded_peak_positions' method.
+    num_peaks: Number of peaks of each line profile.
+    number_of_measurements: Number of images in the SLI image stack, i.e. the number of points in one
+    line profile.
+
+    Returns
+    -------
+    NumPy array of floating point values containing the mean peak distance of the line profiles in degrees.
+    """
+    num_peaks = numpy.asarray(num_peaks)
+    # Scale peaks correctly for direction
+    peak_positions = (numpy.asarray(peak_positions) - number_of_measurements // 2) * (360.0 / number_of_measurements)
+    if peak_positions.shape[-1] % 2 == 1:
+        peak_positions = numpy.concatenate((peak_positions, peak_positions[:, -1:]), axis=-1)
+    distance = numpy.full(num_peaks.shape, BACKGROUND_COLOR, dtype=numpy.float64)
+
+    # distance for one peak = 0
+    distance[num_peaks == 1] = 0
+    # Compute peak distance for curves with an even number of peaks
+    even = (num_peaks >= 2) & (num_peaks % 2 == 0)
+    distances = numpy.abs(peak_positions[:, ::2] - peak_positions[:, 1::2])
+    valid_pairs = numpy.arange(distances.shape[-1]) < (num_peaks // 2)[:, numpy.newaxis]
+    mean_distance = numpy.sum(numpy.where(valid_pairs, distances, 0), axis=-1) / numpy.maximum(num_peaks // 2, 1)
+    mean_distance = numpy.where(mean_distance > 180, 360 - mean_distance, mean_distance)
+    distance[even] = mean_distance[even]
+    return distance
+
+
 def peakdistance_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True,
-                       centroid_calculation=True):
+                       centroid_calculation=True, backend=None):
     """
     Calculate the mean peak distance in degrees between two corresponding peaks for each line profile in an SLI image
     series.
     Note: Please do not use this method when evaluating many line profiles while generating most if not all of the
-    parameter maps. In this case, it is faster to write a simple pipeline as seen in 'SLIXParameterGenerator'.
+    parameter maps. In this case, it is faster to use 'parameter_maps_image' which generates them in a single pass.
 
     Parameters
     ----------
@@ -176,42 +521,14 @@ def peakdistance_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence
     cut_edges: If True, only consider peaks within the second third of all detected peaks.
     centroid_calculation: Use centroid calculation to better determine the peak position regardless of the number of
     measurements / illumination angles used.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
 
     Returns
     -------
     NumPy array of floating point values containing the mean peak distance of the line profiles in degrees.
     """
-    return_value = pymp.shared.array((roiset.shape[0], 1), dtype=numpy.float)
-    pbar = tqdm.tqdm(total=len(roiset), desc='Peak distance')
-    number_of_finished_pixels = pymp.shared.array(CPU_COUNT, dtype=numpy.long)
-    last_sum_of_finished_pixels = 0
-    active_cores = pymp.shared.array(CPU_COUNT, dtype=numpy.bool)
-    active_cores[:] = True
-
-    with pymp.Parallel(CPU_COUNT) as p:
-        number_of_finished_pixels[p.thread_num] = 0
-        for i in p.range(0, len(roiset)):
-            roi = roiset[i]
-            peaks = all_peaks(roi, cut_edges)
-            peaks = accurate_peak_positions(peaks, roi, low_prominence, high_prominence, centroid_calculation)
-            return_value[i] = peakdistance(peaks, len(roi))
-
-            number_of_finished_pixels[p.thread_num] += 1
-            if p.thread_num == 0 and number_of_finished_pixels[p.thread_num] % 1000 == 0:
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-        # When one core has finished, mark it. As long as not all threads are finished continue to update the
-        # progress bar.
-        active_cores[p.thread_num] = False
-        if p.thread_num == 0:
-            while numpy.any(active_cores == True):
-                time.sleep(0.5)
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-            pbar.close()
-    return return_value
+    return parameter_maps_image(roiset, ['peakdistance'], low_prominence, high_prominence, cut_edges,
+                                centroid_calculation, backend=backend)['peakdistance']
 
 
 def prominence(peak_positions, line_profile):
@@ -234,13 +551,154 @@ def prominence(peak_positions, line_profile):
     return 0 if num_peaks == 0 else numpy.mean(peak_prominences(prominence_roi, peak_positions)[0])
 
 
-def prominence_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True):
+def _scan_peak_bases_loop(roiset, pixel, peak, direction):
+    """
+    Same as '_scan_peak_bases' but walking from one peak after another. This is only fast when compiled with Numba.
+    """
+    minimum = numpy.empty(len(peak), dtype=roiset.dtype)
+    base = numpy.empty(len(peak), dtype=peak.dtype)
+    for i in range(len(peak)):
+        peak_height = roiset[pixel[i], peak[i]]
+        minimum[i] = peak_height
+        base[i] = peak[i]
+        position = peak[i] + direction
+        while 0 <= position < roiset.shape[-1]:
+            value = roiset[pixel[i], position]
+            if not value <= peak_height:
+                break
+            if value < minimum[i]:
+                minimum[i] = value
+                base[i] = position
+            position += direction
+    return minimum, base
+
+
+def _scan_width_intersections_loop(roiset, pixel, peak, width_height, base, direction):
+    """
+    Same as '_scan_width_intersections' but walking from one peak after another. This is only fast when compiled with
+    Numba.
+    """
+    intersection = numpy.empty(len(peak), dtype=numpy.float64)
+    for i in range(len(peak)):
+        position = peak[i]
+        while position * direction < base[i] * direction and width_height[i] < roiset[pixel[i], position]:
+            position += direction
+        value = roiset[pixel[i], position]
+        intersection[i] = position
+        if value < width_height[i]:
+            intersection[i] -= direction * (width_height[i] - value) / (roiset[pixel[i], position - direction] - value)
+    return intersection
+
+
+if numba is not None:
+    _scan_peak_bases_compiled = numba.njit(cache=True, nogil=True)(_scan_peak_bases_loop)
+    _scan_width_intersections_compiled = numba.njit(cache=True, nogil=True)(_scan_width_intersections_loop)
+
+
+def _scan_peak_bases(roiset, pixel, peak, direction):
+    """
+    Walk from each peak into the given direction until a higher value or the end of the line profile is reached. This
+    is the search used by scipy.signal.peak_prominences, executed for all peaks at once.
+
+    Parameters
+    ----------
+    roiset: 2D-NumPy array (number of pixels, number of points in one line profile).
+    pixel: Row of each peak in the roiset.
+    peak: Position of each peak in its line profile.
+    direction: -1 to search on the left side of the peaks, 1 to search on the right side.
+
+    Returns
+    -------
+    Minimum value and its position (the base of the peak) for each peak.
+    """
+    if USE_NUMBA and numba is not None:
+        return _scan_peak_bases_compiled(roiset, pixel, peak, direction)
+    peak_height = roiset[pixel, peak]
+    minimum = peak_height.copy()
+    base = peak.copy()
+    active = numpy.arange(len(peak))
+    distance = 1
+    while len(active) > 0:
+        position = peak[active] + direction * distance
+        inside = (position >= 0) & (position < roiset.shape[-1])
+        active, position = active[inside], position[inside]
+        value = roiset[pixel[active], position]
+        not_higher = value <= peak_height[active]
+        active, position, value = active[not_higher], position[not_higher], value[not_higher]
+        lower = value < minimum[active]
+        minimum[active[lower]] = value[lower]
+        base[active[lower]] = position[lower]
+        distance += 1
+    return minimum, base
+
+
+def peak_prominences_roiset(roiset, peak_mask):
+    """
+    Calculate the prominence of all peaks in a roiset at once. The results are the same as calling
+    scipy.signal.peak_prominences for each line profile, but the whole roiset is evaluated with a few array operations.
+    The line profiles are not normalized. Use 'normalize_roiset' beforehand if needed.
+
+    Parameters
+    ----------
+    roiset: 2D-NumPy array with the shape (number of pixels, number of points in one line profile).
+    peak_mask: Boolean NumPy array with the same shape as the roiset marking the peaks which should be evaluated,
+    e.g. the result of 'all_peaks_roiset'.
+
+    Returns
+    -------
+    Prominences, left bases and right bases of all peaks as NumPy arrays with the same shape as the roiset. Entries
+    which are not part of the peak mask are zero.
+    """
+    roiset = numpy.asarray(roiset, dtype=numpy.float64)
+    pixel, peak = numpy.nonzero(peak_mask)
+    left_minimum, left_base = _scan_peak_bases(roiset, pixel, peak, -1)
+    right_minimum, right_base = _scan_peak_bases(roiset, pixel, peak, 1)
+
+    prominences = numpy.zeros(roiset.shape, dtype=numpy.float64)
+    left_bases = numpy.zeros(roiset.shape, dtype=numpy.intp)
+    right_bases = numpy.zeros(roiset.shape, dtype=numpy.intp)
+    prominences[pixel, peak] = roiset[pixel, peak] - numpy.maximum(left_minimum, right_minimum)
+    left_bases[pixel, peak] = left_base
+    right_bases[pixel, peak] = right_base
+    return prominences, left_bases, right_bases
+
+
+def _mean_per_profile(values, peak_mask):
+    """
+    Calculate the mean of the given peak values for each line profile. Line profiles without any peak result in 0.
+    """
+    num_peaks = numpy.count_nonzero(peak_mask, axis=-1)
+    value_sum = numpy.sum(numpy.where(peak_mask, values, 0), axis=-1)
+    return numpy.where(num_peaks > 0, value_sum / numpy.maximum(num_peaks, 1), 0)
+
+
+def prominence_roiset(roiset, peak_mask):
+    """
+    Calculate the mean peak prominence of the given peaks for each line profile in a roiset. This is the counterpart of
+    'prominence' for all line profiles of a roiset at once. The line profiles will be normalized by dividing them
+    through their mean value. Therefore, values above 1 are possible.
+
+    Parameters
+    ----------
+    roiset: 2D-NumPy array with the shape (number of pixels, number of points in one line profile).
+    peak_mask: Boolean NumPy array with the same shape as the roiset marking the peaks which should be evaluated.
+
+    Returns
+    -------
+    NumPy array where each entry corresponds to the mean peak prominence of the line profile.
+    """
+    normalized_roiset = normalize_roiset(roiset, kind_of_normalization=1)
+    return _mean_per_profile(peak_prominences_roiset(normalized_roiset, peak_mask)[0], peak_mask)
+
+
+def prominence_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True,
+                     backend=None):
     """
     Calculate the mean peak prominence of all given peak positions for each line profile in an SLI image series. Each
     line profile will be normalized by dividing the line profile through its mean value. Therefore, values above 1 are
     possible.
     Note: Please do not use this method when evaluating many line profiles while generating most if not all of the
-    parameter maps. In this case, it is faster to write a simple pipeline as seen in 'SLIXParameterGenerator'.
+    parameter maps. In this case, it is faster to use 'parameter_maps_image' which generates them in a single pass.
 
     Parameters
     ----------
@@ -248,41 +706,14 @@ def prominence_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=n
     low_prominence: Lower prominence bound for detecting a peak.
     high_prominence: Higher prominence bound for detecting a peak.
     cut_edges: If True, only consider peaks within the second third of all detected peaks.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
 
     Returns
     -------
     NumPy array where each entry corresponds to the mean peak prominence of the line profile.
     """
-    return_value = pymp.shared.array((roiset.shape[0], 1), dtype=numpy.float)
-    pbar = tqdm.tqdm(total=len(roiset), desc='Peak prominence')
-    number_of_finished_pixels = pymp.shared.array(CPU_COUNT, dtype=numpy.long)
-    last_sum_of_finished_pixels = 0
-    active_cores = pymp.shared.array(CPU_COUNT, dtype=numpy.bool)
-    active_cores[:] = True
-
-    with pymp.Parallel(CPU_COUNT) as p:
-        number_of_finished_pixels[p.thread_num] = 0
-        for i in p.range(0, len(roiset)):
-            roi = roiset[i]
-            peaks = all_peaks(roi, cut_edges)
-            peaks = accurate_peak_positions(peaks, roi, low_prominence, high_prominence, False)
-            return_value[i] = prominence(peaks, roi)
-            number_of_finished_pixels[p.thread_num] += 1
-            if p.thread_num == 0 and number_of_finished_pixels[p.thread_num] % 1000 == 0:
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-        # When one core has finished, mark it. As long as not all threads are finished continue to update the
-        # progress bar.
-        active_cores[p.thread_num] = False
-        if p.thread_num == 0:
-            while numpy.any(active_cores == True):
-                time.sleep(0.5)
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-            pbar.close()
-    return return_value
+    return parameter_maps_image(roiset, ['peakprominence'], low_prominence, high_prominence, cut_edges,
+                                False, backend=backend)['peakprominence']
 
 
 def peakwidth(peak_positions, line_profile, number_of_measurements):
@@ -308,10 +739,93 @@ def peakwidth(peak_positions, line_profile, number_of_measurements):
         return 0
 
 
-def peakwidth_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True):
+def _scan_width_intersections(roiset, pixel, peak, width_height, base, direction):
+    """
+    Walk from each peak into the given direction until the line profile drops below the width height or the base of
+    the peak is reached. The intersection point is interpolated linearly like in scipy.signal.peak_widths.
+    """
+    if USE_NUMBA and numba is not None:
+        return _scan_width_intersections_compiled(roiset, pixel, peak, width_height, base, direction)
+    position = peak.copy()
+    active = numpy.arange(len(peak))
+    while len(active) > 0:
+        current = position[active]
+        keep = (current * direction < base[active] * direction) & \
+               (width_height[active] < roiset[pixel[active], current])
+        active = active[keep]
+        position[active] += direction
+    value = roiset[pixel, position]
+    intersection = position.astype(numpy.float64)
+    below = value < width_height
+    neighbour = roiset[pixel[below], position[below] - direction]
+    intersection[below] -= direction * (width_height[below] - value[below]) / (neighbour - value[below])
+    return intersection
+
+
+def peak_widths_roiset(roiset, peak_mask, rel_height=0.5, prominence_data=None):
+    """
+    Calculate the width of all peaks in a roiset at once. The results are the same as calling scipy.signal.peak_widths
+    for each line profile, but the whole roiset is evaluated with a few array operations.
+
+    Parameters
+    ----------
+    roiset: 2D-NumPy array with the shape (number of pixels, number of points in one line profile).
+    peak_mask: Boolean NumPy array with the same shape as the roiset marking the peaks which should be evaluated.
+    rel_height: Relative height at which the peak width is measured as a percentage of its prominence.
+    prominence_data: Result of 'peak_prominences_roiset' for the same roiset and peaks. If None, the prominences will be
+    calculated.
+
+    Returns
+    -------
+    Widths, width heights, left intersection points and right intersection points of all peaks as NumPy arrays with
+    the same shape as the roiset. Entries which are not part of the peak mask are zero.
+    """
+    roiset = numpy.asarray(roiset, dtype=numpy.float64)
+    if prominence_data is None:
+        prominence_data = peak_prominences_roiset(roiset, peak_mask)
+    prominences, left_bases, right_bases = prominence_data
+    pixel, peak = numpy.nonzero(peak_mask)
+
+    width_height = roiset[pixel, peak] - prominences[pixel, peak] * rel_height
+    left_intersection = _scan_width_intersections(roiset, pixel, peak, width_height, left_bases[pixel, peak], -1)
+    right_intersection = _scan_width_intersections(roiset, pixel, peak, width_height, right_bases[pixel, peak], 1)
+
+    widths = numpy.zeros(roiset.shape, dtype=numpy.float64)
+    width_heights = numpy.zeros(roiset.shape, dtype=numpy.float64)
+    left_ips = numpy.zeros(roiset.shape, dtype=numpy.float64)
+    right_ips = numpy.zeros(roiset.shape, dtype=numpy.float64)
+    widths[pixel, peak] = right_intersection - left_intersection
+    width_heights[pixel, peak] = width_height
+    left_ips[pixel, peak] = left_intersection
+    right_ips[pixel, peak] = right_intersection
+    return widths, width_heights, left_ips, right_ips
+
+
+def peakwidth_roiset(roiset, peak_mask, number_of_measurements):
+    """
+    Calculate the mean peak width of the given peaks for each line profile in a roiset. This is the counterpart of
+    'peakwidth' for all line profiles of a roiset at once.
+
+    Parameters
+    ----------
+    roiset: 2D-NumPy array with the shape (number of pixels, number of points in one line profile).
+    peak_mask: Boolean NumPy array with the same shape as the roiset marking the peaks which should be evaluated.
+    number_of_measurements: Number of measurements during a full SLI measurement, i.e. the number of points in one line
+    profile.
+
+    Returns
+    -------
+    NumPy array where each entry corresponds to the mean peak width of the line profile in degrees.
+    """
+    widths = peak_widths_roiset(roiset, peak_mask, rel_height=0.5)[0]
+    return _mean_per_profile(widths, peak_mask) * (360.0 / number_of_measurements)
+
+
+def peakwidth_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True,
+                    backend=None):
     """
     Note: Please do not use this method when evaluating many line profiles while generating most if not all of the
-    parameter maps. In this case, it is faster to write a simple pipeline as seen in 'SLIXParameterGenerator'.
+    parameter maps. In this case, it is faster to use 'parameter_maps_image' which generates them in a single pass.
 
     Parameters
     ----------
@@ -319,41 +833,14 @@ def peakwidth_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=nu
     low_prominence: Lower prominence bound for detecting a peak.
     high_prominence: Higher prominence bound for detecting a peak.
     cut_edges: If True, only consider peaks within the second third of all detected peaks.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
 
     Returns
     -------
     NumPy array where each entry corresponds to the mean peak width of the line profile.
     """
-    return_value = pymp.shared.array((roiset.shape[0], 1), dtype=numpy.float)
-    pbar = tqdm.tqdm(total=len(roiset), desc='Peak width')
-    number_of_finished_pixels = pymp.shared.array(CPU_COUNT, dtype=numpy.long)
-    last_sum_of_finished_pixels = 0
-    active_cores = pymp.shared.array(CPU_COUNT, dtype=numpy.bool)
-    active_cores[:] = True
-
-    with pymp.Parallel(CPU_COUNT) as p:
-        number_of_finished_pixels[p.thread_num] = 0
-        for i in p.range(0, len(roiset)):
-            roi = roiset[i]
-            peaks = all_peaks(roi, cut_edges)
-            peaks = accurate_peak_positions(peaks, roi, low_prominence, high_prominence, False)
-            return_value[i] = peakwidth(peaks, roi, len(roi) // 2)
-            number_of_finished_pixels[p.thread_num] += 1
-            if p.thread_num == 0 and number_of_finished_pixels[p.thread_num] % 1000 == 0:
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-        # When one core has finished, mark it. As long as not all threads are finished continue to update the
-        # progress bar.
-        active_cores[p.thread_num] = False
-        if p.thread_num == 0:
-            while numpy.any(active_cores == True):
-                time.sleep(0.5)
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-            pbar.close()
-    return return_value
+    return parameter_maps_image(roiset, ['peakwidth'], low_prominence, high_prominence, cut_edges,
+                                False, backend=backend)['peakwidth']
 
 
 def crossing_direction(peak_positions, number_of_measurements):
@@ -392,7 +879,47 @@ def crossing_direction(peak_positions, number_of_measurements):
     return ret_val
 
 
-def crossing_direction_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True):
+def crossing_direction_roiset(peak_positions, num_peaks, number_of_measurements):
+    """
+    Calculate up to three direction angles for all line profiles of a roiset at once. This is the counterpart of
+    'crossing_direction' working on a padded peak position matrix. The same rules apply: If two peaks are too far away
+    or too near (outside of 180°±35°), the direction angle will be considered as invalid, resulting in a direction angle
+    of BACKGROUND_COLOR.
+
+    Parameters
+    ----------
+    peak_positions: Padded peak position matrix of the 'padded_peak_positions' method.
+    num_peaks: Number of peaks of each line profile.
+    number_of_measurements: Number of measurements during a full SLI measurement, i.e. the number of points in the line
+    profile.
+
+    Returns
+    -------
+    NumPy array with the shape (number of pixels, 3) containing up to three direction angles. If a direction angle is
+    invalid or missing, the array entry will be BACKGROUND_COLOR instead.
+    """
+    num_peaks = numpy.asarray(num_peaks)
+    # Scale peaks correctly for direction
+    peak_positions = (numpy.asarray(peak_positions) - number_of_measurements // 2) * (360.0 / number_of_measurements)
+    # Change behaviour based on amount of peaks (steep, crossing, ...)
+    ret_val = numpy.full((num_peaks.shape[0], 3), BACKGROUND_COLOR, dtype=numpy.float64)
+
+    one_peak = num_peaks == 1
+    ret_val[one_peak, 0] = (270.0 - peak_positions[one_peak, 0]) % 180
+    for number_of_directions in range(1, min(3, peak_positions.shape[-1] // 2) + 1):
+        selected = num_peaks == 2 * number_of_directions
+        first_peaks = peak_positions[selected, :number_of_directions]
+        second_peaks = peak_positions[selected, number_of_directions:2 * number_of_directions]
+        directions = (270.0 - ((second_peaks + first_peaks) / 2.0)) % 180
+        if number_of_directions > 1:
+            distances = second_peaks - first_peaks
+            directions[numpy.abs(distances - 180) > 35] = BACKGROUND_COLOR
+        ret_val[selected, :number_of_directions] = directions
+    return ret_val
+
+
+def crossing_direction_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True,
+                             backend=None):
     """
     Calculate up to three direction angles based on the given peak positions. If more than six peaks are present, no
     direction angle will be calculated to avoid errors. This will result in a direction angle of BACKGROUND_COLOR.
@@ -400,7 +927,7 @@ def crossing_direction_image(roiset, low_prominence=TARGET_PROMINENCE, high_prom
     If two peaks are too far away or too near (outside of 180°±35°), the direction angle will be considered as invalid,
     resulting in a direction angle of BACKGROUND_COLOR.
     Note: Please do not use this method when evaluating many line profiles while generating most if not all of the
-    parameter maps. In this case, it is faster to write a simple pipeline as seen in 'SLIXParameterGenerator'.
+    parameter maps. In this case, it is faster to use 'parameter_maps_image' which generates them in a single pass.
 
     Parameters
     ----------
@@ -408,6 +935,7 @@ def crossing_direction_image(roiset, low_prominence=TARGET_PROMINENCE, high_prom
     low_prominence: Lower prominence bound for detecting a peak.
     high_prominence: Higher prominence bound for detecting a peak.
     cut_edges: If True, only consider peaks within the second third of all detected peaks.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
 
     Returns
     -------
@@ -416,36 +944,7 @@ def crossing_direction_image(roiset, low_prominence=TARGET_PROMINENCE, high_prom
     will be BACKGROUND_COLOR instead.
 
     """
-    return_value = pymp.shared.array((roiset.shape[0], 3), dtype=numpy.float)
-    pbar = tqdm.tqdm(total=len(roiset), desc='Direction')
-    number_of_finished_pixels = pymp.shared.array(CPU_COUNT, dtype=numpy.long)
-    last_sum_of_finished_pixels = 0
-    active_cores = pymp.shared.array(CPU_COUNT, dtype=numpy.bool)
-    active_cores[:] = True
-
-    with pymp.Parallel(CPU_COUNT) as p:
-        number_of_finished_pixels[p.thread_num] = 0
-        for i in p.range(0, len(roiset)):
-            roi = roiset[i]
-            peaks = all_peaks(roi, cut_edges)
-            peaks = accurate_peak_positions(peaks, roi, low_prominence, high_prominence)
-            return_value[i, :] = crossing_direction(peaks, len(roi) // 2)
-            number_of_finished_pixels[p.thread_num] += 1
-            if p.thread_num == 0 and number_of_finished_pixels[p.thread_num] % 1000 == 0:
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-        # When one core has finished, mark it. As long as not all threads are finished continue to update the
-        # progress bar.
-        active_cores[p.thread_num] = False
-        if p.thread_num == 0:
-            while numpy.any(active_cores == True):
-                time.sleep(0.5)
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-            pbar.close()
-    return return_value
+    return parameter_maps_image(roiset, ['dir'], low_prominence, high_prominence, cut_edges, backend=backend)['dir']
 
 
 def non_crossing_direction(peak_positions, number_of_measurements):
@@ -477,13 +976,43 @@ def non_crossing_direction(peak_positions, number_of_measurements):
         return BACKGROUND_COLOR
 
 
-def non_crossing_direction_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True):
+def non_crossing_direction_roiset(peak_positions, num_peaks, number_of_measurements):
+    """
+    Calculate one direction angle for all line profiles of a roiset at once. This is the counterpart of
+    'non_crossing_direction' working on a padded peak position matrix.
+
+    Parameters
+    ----------
+    peak_positions: Padded peak position matrix of the 'padded_peak_positions' method.
+    num_peaks: Number of peaks of each line profile.
+    number_of_measurements: Number of images in an SLI image stack, i.e. the number of points in the line
+    profile.
+
+    Returns
+    -------
+    NumPy array of floating point values containing the direction angle in degrees.
+    If a direction angle is invalid or missing, the array entry will be BACKGROUND_COLOR instead.
+    """
+    num_peaks = numpy.asarray(num_peaks)
+    # Scale peaks correctly for direction
+    peak_positions = (numpy.asarray(peak_positions) - number_of_measurements // 2) * (360.0 / number_of_measurements)
+    # Change behaviour based on amount of peaks (steep, crossing, ...)
+    ret_val = numpy.full(num_peaks.shape, BACKGROUND_COLOR, dtype=numpy.float64)
+    one_peak = num_peaks == 1
+    ret_val[one_peak] = (270 - peak_positions[one_peak, 0]) % 180
+    two_peaks = num_peaks == 2
+    ret_val[two_peaks] = (270 - ((peak_positions[two_peaks, 1] + peak_positions[two_peaks, 0]) / 2.0)) % 180
+    return ret_val
+
+
+def non_crossing_direction_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True,
+                                 backend=None):
     """
     Calculate one direction angle based on the given peak positions. If more than two peaks are present, no
     direction angle will be calculated to avoid errors. This will result in a direction angle of BACKGROUND_COLOR.
     The direction angle is determined by the mid position between two peaks.
     Note: Please do not use this method when evaluating many line profiles while generating most if not all of the
-    parameter maps. In this case, it is faster to write a simple pipeline as seen in SLIXParameterGenerator.
+    parameter maps. In this case, it is faster to use 'parameter_maps_image' which generates them in a single pass.
 
     Parameters
     ----------
@@ -491,42 +1020,615 @@ def non_crossing_direction_image(roiset, low_prominence=TARGET_PROMINENCE, high_
     low_prominence: Lower prominence bound for detecting a peak.
     high_prominence: Higher prominence bound for detecting a peak.
     cut_edges: If True, only consider peaks within the second third of all detected peaks.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
 
     Returns
     -------
     NumPy array of floating point values containing the direction angle in degree.
     If a direction angle is invalid or missing, the returned value will be BACKGROUND_COLOR instead.
     """
-    return_value = pymp.shared.array((roiset.shape[0], 1), dtype=numpy.float)
-    pbar = tqdm.tqdm(total=len(roiset), desc='Non crossing direction')
-    number_of_finished_pixels = pymp.shared.array(CPU_COUNT, dtype=numpy.long)
-    last_sum_of_finished_pixels = 0
-    active_cores = pymp.shared.array(CPU_COUNT, dtype=numpy.bool)
-    active_cores[:] = True
-
-    with pymp.Parallel(CPU_COUNT) as p:
-        number_of_finished_pixels[p.thread_num] = 0
-        for i in p.range(0, len(roiset)):
-            roi = roiset[i]
-            peaks = all_peaks(roi, cut_edges)
-            peaks = accurate_peak_positions(peaks, roi, low_prominence, high_prominence)
-            return_value[i] = non_crossing_direction(peaks, len(roi) // 2)
-            number_of_finished_pixels[p.thread_num] += 1
-            if p.thread_num == 0 and number_of_finished_pixels[p.thread_num] % 1000 == 0:
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-        # When one core has finished, mark it. As long as not all threads are finished continue to update the
-        # progress bar.
-        active_cores[p.thread_num] = False
-        if p.thread_num == 0:
-            while numpy.any(active_cores == True):
-                time.sleep(0.5)
-                sum_of_finished_pixels = numpy.sum(number_of_finished_pixels)
-                pbar.update(sum_of_finished_pixels - last_sum_of_finished_pixels)
-                last_sum_of_finished_pixels = sum_of_finished_pixels
-            pbar.close()
-    return return_value
+    return parameter_maps_image(roiset, ['non_crossing_dir'], low_prominence, high_prominence,
+                                cut_edges, backend=backend)['non_crossing_dir']
+
+
+def _peak_table_roiset(roiset, cut_edges=True, min_prominence=-numpy.inf, fields=None):
+    """
+    Detect all peaks of a chunk of line profiles and calculate the properties of each peak which do not depend on the
+    prominence bounds or the target peak height. The result is a peak table of the chunk (see 'peak_table_image')
+    without corrected positions. The widths and relative prominences of peaks whose prominence is not above
+    min_prominence are zero as these peaks are never selected. fields limits the calculated peak properties to the
+    given names of PEAK_TABLE_FIELDS and CENTROID_WINDOW_FIELDS. If None, all of them are calculated.
+    """
+    if fields is None:
+        fields = PEAK_TABLE_FIELDS + CENTROID_WINDOW_FIELDS
+    if len(fields) > 0:
+        peak_mask = all_peaks_roiset(roiset, cut_edges)
+    else:
+        # Only the maximum, minimum and average of the line profiles are needed
+        peak_mask = numpy.zeros(roiset.shape, dtype=bool)
+    normalized_roiset = normalize_roiset(roiset)
+    prominence = peak_prominences_roiset(normalized_roiset, peak_mask)[0]
+    pixel, peak = numpy.nonzero(peak_mask)
+    peak_table = {'offsets': numpy.concatenate(([0], numpy.cumsum(numpy.count_nonzero(peak_mask, axis=-1)))),
+                  'position': peak, 'prominence': prominence[pixel, peak],
+                  'max': roiset.max(axis=-1), 'min': roiset.min(axis=-1), 'avg': roiset.mean(axis=-1),
+                  'profile_length': numpy.array(roiset.shape[-1])}
+    candidate_peaks = peak_mask & (prominence > min_prominence)
+    if 'width' in fields:
+        peak_table['width'] = peak_widths_roiset(roiset, candidate_peaks, rel_height=0.5)[0][pixel, peak]
+    if 'relative_prominence' in fields:
+        peak_table['relative_prominence'] = peak_prominences_roiset(normalize_roiset(roiset, kind_of_normalization=1),
+                                                                    candidate_peaks)[0][pixel, peak]
+    if any(name in fields for name in CENTROID_WINDOW_FIELDS):
+        normalized_roiset = numpy.asarray(normalized_roiset, dtype=numpy.float64)
+        minimum_mask, minimum_prominence = _minima_roiset(normalized_roiset)
+        _, _, peak_table['centroid_window'], _, peak_table['centroid_window_minima'] = \
+            _centroid_windows(normalized_roiset, peak_mask, minimum_mask, minimum_prominence)
+    return peak_table
+
+
+def _peak_pixels(peak_table):
+    """
+    Pixel of each peak of a peak table.
+    """
+    offsets = numpy.asarray(peak_table['offsets'])
+    return numpy.repeat(numpy.arange(len(offsets) - 1), numpy.diff(offsets))
+
+
+def _select_peaks(peak_table, low_prominence, high_prominence):
+    """
+    Mark the peaks of a peak table whose prominence lies between the prominence bounds.
+    """
+    prominence = numpy.asarray(peak_table['prominence'])
+    return (prominence > low_prominence) & (prominence < high_prominence)
+
+
+def _corrected_positions(peak_table, pixel, selected, low_prominence, high_prominence, target_peak_height):
+    """
+    Correct the positions of the selected peaks of a peak table like 'centroid_correction_roiset' using the centroid
+    windows of the peak table. Returns the corrected position of each selected peak.
+    """
+    peak = numpy.asarray(peak_table['position'])[selected]
+    values = numpy.asarray(peak_table['centroid_window'])[selected]
+    # Positions without a minimum are NaN and therefore never prominent
+    minima = numpy.asarray(peak_table['centroid_window_minima'])[selected]
+    prominent_minima = (minima >= low_prominence) & (minima <= high_prominence)
+    positions = peak[:, numpy.newaxis] + numpy.arange(-MAX_DISTANCE_FOR_CENTROID_ESTIMATION - 1,
+                                                      MAX_DISTANCE_FOR_CENTROID_ESTIMATION + 1)
+    inside = (positions >= 0) & (positions < int(peak_table['profile_length']))
+
+    # Height of the highest selected peak of each pixel. The peaks are sorted by their pixel.
+    peak_values = values[:, MAX_DISTANCE_FOR_CENTROID_ESTIMATION + 1]
+    selected_pixel = pixel[selected]
+    first_peaks = numpy.flatnonzero(numpy.diff(selected_pixel, prepend=-1) != 0)
+    highest_peak = numpy.repeat(numpy.maximum.reduceat(peak_values, first_peaks) if len(peak) > 0 else peak_values,
+                                numpy.diff(numpy.append(first_peaks, len(peak))))
+    target = peak_values - highest_peak * (1 - target_peak_height)
+    return _centroid_correction_windows(peak, values, inside, prominent_minima, target).astype(numpy.float32)
+
+
+def _peak_statistics_maps(peak_table, parameter_maps, pixel, selected, low_prominence, number_of_measurements):
+    """
+    Calculate the parameter maps of a peak table which do not depend on the peak positions.
+    """
+    number_of_pixels = len(peak_table['offsets']) - 1
+    prominence = numpy.asarray(peak_table['prominence'])
+    selected_pixel = pixel[selected]
+    num_selected_peaks = numpy.bincount(selected_pixel, minlength=number_of_pixels)
+
+    def mean_per_pixel(values):
+        value_sum = numpy.bincount(selected_pixel, numpy.asarray(values)[selected], minlength=number_of_pixels)
+        return numpy.where(num_selected_peaks > 0, value_sum / numpy.maximum(num_selected_peaks, 1), 0)
+
+    results = {}
+    for name in parameter_maps:
+        if name in ('max', 'min', 'avg'):
+            results[name] = numpy.asarray(peak_table[name])
+        elif name == 'low_prominence_peaks':
+            results[name] = numpy.bincount(pixel, (prominence > 0) & (prominence < low_prominence),
+                                           minlength=number_of_pixels)
+        elif name == 'high_prominence_peaks':
+            results[name] = num_selected_peaks
+        elif name == 'peakwidth':
+            results[name] = mean_per_pixel(peak_table['width']) * (360.0 / number_of_measurements)
+        elif name == 'peakprominence':
+            results[name] = mean_per_pixel(peak_table['relative_prominence'])
+    return results
+
+
+def _direction_maps(parameter_maps, pixel, selected, peak_positions, number_of_pixels, number_of_measurements):
+    """
+    Calculate the peak distance and direction maps from the positions of the selected peaks.
+    """
+    num_selected_peaks = numpy.bincount(pixel[selected], minlength=number_of_pixels)
+    padded_positions = _pad_peak_values(pixel[selected], peak_positions, num_selected_peaks, BACKGROUND_COLOR)
+    results = {}
+    for name in parameter_maps:
+        if name == 'peakdistance':
+            results[name] = peakdistance_roiset(padded_positions, num_selected_peaks, number_of_measurements)
+        elif name == 'non_crossing_dir':
+            results[name] = non_crossing_direction_roiset(padded_positions, num_selected_peaks,
+                                                          number_of_measurements)
+        elif name == 'dir':
+            results[name] = crossing_direction_roiset(padded_positions, num_selected_peaks, number_of_measurements)
+    return results
+
+
+def _parameter_maps_sweep_peak_table(peak_table, parameter_maps, low_prominences, target_peak_heights,
+                                     high_prominence, centroid_calculation):
+    """
+    Calculate the selected parameter maps of a peak table created with '_peak_table_roiset' for every combination of
+    lower prominence bound and target peak height. Parameter maps which do not depend on the target peak height are
+    only calculated once for each prominence bound. Returns one list of parameter maps for each combination, ordered
+    by the prominence bound first.
+    """
+    number_of_pixels = len(peak_table['offsets']) - 1
+    number_of_measurements = int(peak_table['profile_length']) // 2
+    pixel = _peak_pixels(peak_table)
+    all_results = []
+    for low_prominence in low_prominences:
+        selected = _select_peaks(peak_table, low_prominence, high_prominence)
+        results = _peak_statistics_maps(peak_table, parameter_maps, pixel, selected, low_prominence,
+                                        number_of_measurements)
+        for target_peak_height in target_peak_heights:
+            if any(name in ('peakdistance', 'non_crossing_dir', 'dir') for name in parameter_maps):
+                if centroid_calculation:
+                    peak_positions = _corrected_positions(peak_table, pixel, selected, low_prominence,
+                                                          high_prominence, target_peak_height)
+                else:
+                    peak_positions = numpy.asarray(peak_table['position'])[selected]
+                results.update(_direction_maps(parameter_maps, pixel, selected, peak_positions, number_of_pixels,
+                                               number_of_measurements))
+            all_results.append([results[name] for name in parameter_maps])
+    return all_results
+
+
+def _parameter_maps_sweep_roiset(roiset, parameter_maps, low_prominences, target_peak_heights, high_prominence,
+                                 cut_edges, centroid_calculation):
+    """
+    Calculate the selected parameter maps of a chunk of line profiles for every combination of lower prominence bound
+    and target peak height. The peaks and their prominences, widths and centroid windows are only calculated once.
+    See '_parameter_maps_sweep_peak_table' for the result.
+    """
+    fields = []
+    if any(name not in ('max', 'min', 'avg') for name in parameter_maps):
+        fields.extend(['position', 'prominence'])
+    if 'peakwidth' in parameter_maps:
+        fields.append('width')
+    if 'peakprominence' in parameter_maps:
+        fields.append('relative_prominence')
+    if centroid_calculation and any(name in ('peakdistance', 'non_crossing_dir', 'dir') for name in parameter_maps):
+        fields.extend(CENTROID_WINDOW_FIELDS)
+    peak_table = _peak_table_roiset(roiset, cut_edges, min(low_prominences), fields)
+    return _parameter_maps_sweep_peak_table(peak_table, parameter_maps, low_prominences, target_peak_heights,
+                                            high_prominence, centroid_calculation)
+
+
+def parameter_maps_image(roiset, parameter_maps=PARAMETER_MAPS, low_prominence=TARGET_PROMINENCE,
+                         high_prominence=numpy.inf, cut_edges=True, centroid_calculation=True, extend=False,
+                         mask=None, backend=None, progress_callback=None):
+    """
+    Calculate multiple parameter maps of an SLI image series in a single parallel pass. Intermediate results which
+    are needed by multiple parameter maps (normalized line profiles, detected peaks, prominence-filtered peaks and
+    centroid-corrected peak positions) are only calculated once for each line profile. This is much faster than
+    calling the corresponding *_image methods one after another.
+
+    Parameters
+    ----------
+    roiset: Full SLI measurement (series of images) which is prepared for the pipeline using the SLIX toolbox methods.
+    parameter_maps: Names of the parameter maps which will be generated. Available parameter maps are:
+        max : Maximum of the line profile
+        min : Minimum of the line profile
+        avg : Average of the line profile
+        low_prominence_peaks : Number of peaks with a prominence below low_prominence
+        high_prominence_peaks : Number of peaks with a prominence between low_prominence and high_prominence
+        peakwidth : Mean peak width in degrees
+        peakprominence : Mean peak prominence
+        peakdistance : Mean peak distance in degrees
+        non_crossing_dir : Non-crossing direction angle
+        dir : Up to three crossing direction angles
+    low_prominence: Lower prominence bound for detecting a peak.
+    high_prominence: Higher prominence bound for detecting a peak.
+    cut_edges: If True, only consider peaks within the second third of all detected peaks.
+    centroid_calculation: Use centroid calculation to better determine the peak position regardless of the number of
+    measurements / illumination angles used.
+    extend: If True, the roiset was created without extending the line profiles (see 'create_roiset'). The line
+    profiles will then be extended chunk by chunk while evaluating them.
+    mask: Background mask of the roiset (see 'create_background_mask'). If given, only the foreground pixels will be
+    evaluated. Background pixels get the values of a line profile containing only zeros, i.e. zero or
+    BACKGROUND_COLOR for the peak distance and direction maps.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
+    progress_callback: Function which will be called with the progress events (stage, done, total). If None,
+    PROGRESS_CALLBACK will be used.
+
+    Returns
+    -------
+    Dictionary with the names of the parameter maps as keys. Each value is a NumPy array with the shape (x, 1), or
+    (x, 3) for 'dir', where x equals the number of pixels of the SLI image series.
+    """
+    return parameter_maps_sweep_image(roiset, [low_prominence], [TARGET_PEAK_HEIGHT], parameter_maps,
+                                      high_prominence, cut_edges, centroid_calculation, extend, mask, backend,
+                                      progress_callback)[(low_prominence, TARGET_PEAK_HEIGHT)]
+
+
+def parameter_maps_sweep_image(roiset, low_prominences=(TARGET_PROMINENCE,), target_peak_heights=(TARGET_PEAK_HEIGHT,),
+                               parameter_maps=PARAMETER_MAPS, high_prominence=numpy.inf, cut_edges=True,
+                               centroid_calculation=True, extend=False, mask=None, backend=None,
+                               progress_callback=None):
+    """
+    Calculate parameter maps of an SLI image series for every combination of the given lower prominence bounds and
+    target peak heights in a single parallel pass. The peaks and their prominences are only detected once for each
+    line profile. This allows a fast comparison of different thresholds.
+
+    Parameters
+    ----------
+    roiset: Full SLI measurement (series of images) which is prepared for the pipeline using the SLIX toolbox methods.
+    low_prominences: Lower prominence bounds for detecting a peak.
+    target_peak_heights: Peak tip heights relative to the highest peak used for the centroid correction (see
+    TARGET_PEAK_HEIGHT).
+    parameter_maps: Names of the parameter maps which will be generated. See 'parameter_maps_image'.
+    high_prominence: Higher prominence bound for detecting a peak.
+    cut_edges: If True, only consider peaks within the second third of all detected peaks.
+    centroid_calculation: Use centroid calculation to better determine the peak position regardless of the number of
+    measurements / illumination angles used.
+    extend: If True, the roiset was created without extending the line profiles (see 'create_roiset'). The line
+    profiles will then be extended chunk by chunk while evaluating them.
+    mask: Background mask of the roiset (see 'create_background_mask'). See 'parameter_maps_image'.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
+    progress_callback: Function which will be called with the progress events (stage, done, total). If None,
+    PROGRESS_CALLBACK will be used.
+
+    Returns
+    -------
+    Dictionary with the pairs (low_prominence, target_peak_height) as keys. Each value is a dictionary like the result
+    of 'parameter_maps_image'.
+    """
+    parameter_maps = list(parameter_maps)
+    _check_parameter_maps(parameter_maps)
+    thresholds = [(low_prominence, target_peak_height) for low_prominence in low_prominences
+                  for target_peak_height in target_peak_heights]
+    columns = [3 if name == 'dir' else 1 for name in parameter_maps]
+    column_starts = numpy.concatenate(([0], numpy.cumsum(columns)))
+    threshold_starts = numpy.arange(len(thresholds) + 1) * column_starts[-1]
+
+    return_value = shared_array((roiset.shape[0], threshold_starts[-1]), numpy.float64, backend)
+
+    def write_results(pixels, all_results):
+        for threshold_index, results in enumerate(all_results):
+            for index, result in enumerate(results):
+                start = threshold_starts[threshold_index] + column_starts[index]
+                return_value[pixels, start:start + columns[index]] = result.reshape(len(result), -1)
+
+    if mask is None:
+        foreground_pixels = None
+        number_of_pixels = len(roiset)
+    else:
+        foreground_pixels = numpy.flatnonzero(~numpy.asarray(mask, dtype=bool).reshape(-1))
+        number_of_pixels = len(foreground_pixels)
+        background = numpy.zeros((1, roiset.shape[-1]))
+        if extend:
+            background = extend_roiset(background)
+        write_results(slice(None), _parameter_maps_sweep_roiset(background, parameter_maps, low_prominences,
+                                                                target_peak_heights, high_prominence, cut_edges,
+                                                                centroid_calculation))
+
+    def evaluate_chunk(chunk_start):
+        if foreground_pixels is None:
+            pixels = slice(chunk_start, min(chunk_start + CHUNK_SIZE, len(roiset)))
+        else:
+            # Only the foreground pixels of the chunk are copied into the work array
+            pixels = foreground_pixels[chunk_start:chunk_start + CHUNK_SIZE]
+        chunk = roiset[pixels]
+        if extend:
+            chunk = extend_roiset(chunk)
+        write_results(pixels, _parameter_maps_sweep_roiset(chunk, parameter_maps, low_prominences,
+                                                           target_peak_heights, high_prominence, cut_edges,
+                                                           centroid_calculation))
+
+    parallel_for(evaluate_chunk, 0, number_of_pixels, CHUNK_SIZE, backend, 'Parameter maps', progress_callback)
+    return {threshold: {name: return_value[:, threshold_starts[threshold_index] + column_starts[index]:
+                                           threshold_starts[threshold_index] + column_starts[index + 1]]
+                        for index, name in enumerate(parameter_maps)}
+            for threshold_index, threshold in enumerate(thresholds)}
+
+
+PEAK_TABLE_FIELDS = ('position', 'corrected_position', 'prominence', 'relative_prominence', 'width')
+# Peak properties which are stored in addition by 'peak_table_image' with centroid_windows=True. They allow
+# correcting the peak positions for other prominence bounds and target peak heights.
+CENTROID_WINDOW_FIELDS = ('centroid_window', 'centroid_window_minima')
+
+
+def corrected_peak_positions(peak_table, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf,
+                             target_peak_height=TARGET_PEAK_HEIGHT):
+    """
+    Correct the positions of the peaks of a peak table created with centroid_windows=True (see 'peak_table_image')
+    for the given prominence bounds and target peak height. The results are the same as the corrected positions of a
+    peak table created with these parameters.
+
+    Parameters
+    ----------
+    peak_table: Dictionary containing the peak table with centroid windows.
+    low_prominence: Lower prominence bound for detecting a peak.
+    high_prominence: Higher prominence bound for detecting a peak.
+    target_peak_height: Peak tip height relative to the highest peak (see TARGET_PEAK_HEIGHT).
+
+    Returns
+    -------
+    NumPy array containing the corrected position of each peak. NaN for peaks whose prominence is not within
+    low_prominence and high_prominence.
+    """
+    for name in CENTROID_WINDOW_FIELDS:
+        if name not in peak_table:
+            raise ValueError('The peak table does not contain the centroid windows. Create it with '
+                             'centroid_windows=True.')
+    selected = _select_peaks(peak_table, low_prominence, high_prominence)
+    corrected_position = numpy.full(len(selected), numpy.nan, dtype=numpy.float32)
+    corrected_position[selected] = _corrected_positions(peak_table, _peak_pixels(peak_table), selected,
+                                                        low_prominence, high_prominence, target_peak_height)
+    return corrected_position
+
+
+def peak_table_image(roiset, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf, cut_edges=True,
+                     centroid_calculation=True, extend=False, mask=None, backend=None, progress_callback=None,
+                     centroid_windows=False):
+    """
+    Detect all peaks of an SLI image series and store them in a peak table. The peak table keeps the properties of
+    every single peak in a compact CSR-like format: The peaks of pixel i are the entries offsets[i]:offsets[i + 1] of
+    the flat peak arrays, sorted by their position. All parameter maps can be derived from the peak table with
+    'parameter_maps_peak_table' without detecting the peaks again.
+
+    Parameters
+    ----------
+    roiset: Full SLI measurement (series of images) which is prepared for the pipeline using the SLIX toolbox methods.
+    low_prominence: Lower prominence bound for detecting a peak.
+    high_prominence: Higher prominence bound for detecting a peak.
+    cut_edges: If True, only consider peaks within the second third of all detected peaks.
+    centroid_calculation: Use centroid calculation to better determine the peak position regardless of the number of
+    measurements / illumination angles used.
+    extend: If True, the roiset was created without extending the line profiles (see 'create_roiset').
+    mask: Background mask of the roiset (see 'create_background_mask'). Background pixels will not contain any peaks.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
+    progress_callback: Function which will be called with the progress events (stage, done, total). If None,
+    PROGRESS_CALLBACK will be used.
+    centroid_windows: If True, the peak table additionally contains the centroid windows of all peaks (see
+    CENTROID_WINDOW_FIELDS). They allow deriving parameter maps for other prominence bounds and target peak heights
+    with 'parameter_maps_sweep_peak_table' and 'corrected_peak_positions'.
+
+    Returns
+    -------
+    Dictionary containing the peak table with the following NumPy arrays:
+        offsets : Index of the first peak of each pixel in the flat peak arrays (number of pixels + 1 entries)
+        position : Position of the peak in the extended line profile. Subtract number_of_measurements // 2 to get
+                   the index of the measurement.
+        corrected_position : Position of the peak after the centroid correction. NaN for peaks whose prominence is
+                             not within low_prominence and high_prominence.
+        prominence : Prominence of the peak in the line profile normalized to values between 0 and 1
+        relative_prominence : Prominence of the peak in the line profile divided by its mean value
+        width : Width of the peak at half of its prominence in measurements
+        centroid_window, centroid_window_minima : Normalized line profile and prominences of the minima (NaN for
+                                                  other positions) around the peak. Only if centroid_windows is True.
+        max, min, avg : Maximum, minimum and average of each line profile
+        number_of_measurements, profile_length, low_prominence, high_prominence : Parameters used to create the peak
+                                                                                  table
+    """
+    number_of_pixels = roiset.shape[0]
+    profile_length = roiset.shape[-1] * 2 if extend else roiset.shape[-1]
+    number_of_measurements = profile_length // 2
+    # Upper bound of the number of peaks in one line profile as neighbouring points cannot both be peaks
+    if cut_edges:
+        max_peaks = number_of_measurements // 2 + 1
+    else:
+        max_peaks = (profile_length + 1) // 2
+    window_size = 2 * MAX_DISTANCE_FOR_CENTROID_ESTIMATION + 2
+    field_shapes = {'position': ((), numpy.intp), 'corrected_position': ((), numpy.float32),
+                    'prominence': ((), numpy.float64), 'relative_prominence': ((), numpy.float64),
+                    'width': ((), numpy.float64)}
+    if centroid_windows:
+        for name in CENTROID_WINDOW_FIELDS:
+            field_shapes[name] = ((window_size,), numpy.float64)
+
+    num_peaks = shared_array(number_of_pixels, numpy.intp, backend)
+    padded_fields = {name: shared_array((number_of_pixels, max_peaks) + shape, dtype, backend)
+                     for name, (shape, dtype) in field_shapes.items()}
+    statistics = shared_array((number_of_pixels, 3), numpy.float64, backend)
+
+    # The centroid windows are needed for the corrected positions even if they are not stored
+    fields = PEAK_TABLE_FIELDS + CENTROID_WINDOW_FIELDS if centroid_calculation or centroid_windows \
+        else PEAK_TABLE_FIELDS
+    if mask is None:
+        foreground_pixels = numpy.arange(number_of_pixels)
+    else:
+        foreground_pixels = numpy.flatnonzero(~numpy.asarray(mask, dtype=bool).reshape(-1))
+
+    def evaluate_chunk(chunk_start):
+        pixels = foreground_pixels[chunk_start:chunk_start + CHUNK_SIZE]
+        chunk = roiset[pixels]
+        if extend:
+            chunk = extend_roiset(chunk)
+        chunk_table = _peak_table_roiset(chunk, cut_edges, -numpy.inf, fields)
+        statistics[pixels] = numpy.stack((chunk_table['max'], chunk_table['min'], chunk_table['avg']), axis=-1)
+        chunk_num_peaks = numpy.diff(chunk_table['offsets'])
+        num_peaks[pixels] = chunk_num_peaks
+        pixel = _peak_pixels(chunk_table)
+        selected = _select_peaks(chunk_table, low_prominence, high_prominence)
+        chunk_table['corrected_position'] = numpy.full(len(pixel), numpy.nan, dtype=numpy.float32)
+        chunk_table['corrected_position'][selected] = _corrected_positions(
+            chunk_table, pixel, selected, low_prominence, high_prominence, TARGET_PEAK_HEIGHT) \
+            if centroid_calculation else chunk_table['position'][selected]
+        for name, padded_field in padded_fields.items():
+            padded_values = _pad_peak_values(pixel, chunk_table[name], chunk_num_peaks, 0)
+            padded_field[pixels, :padded_values.shape[1]] = padded_values
+
+    parallel_for(evaluate_chunk, 0, len(foreground_pixels), CHUNK_SIZE, backend, 'Peak table', progress_callback)
+
+    peak_table = {'offsets': numpy.concatenate(([0], numpy.cumsum(num_peaks)))}
+    valid_peaks = numpy.arange(max_peaks) < numpy.asarray(num_peaks)[:, numpy.newaxis]
+    for name, padded_field in padded_fields.items():
+        peak_table[name] = numpy.asarray(padded_field)[valid_peaks]
+    for index, name in enumerate(('max', 'min', 'avg')):
+        peak_table[name] = numpy.array(statistics[:, index])
+    peak_table['number_of_measurements'] = numpy.array(number_of_measurements)
+    peak_table['profile_length'] = numpy.array(profile_length)
+    peak_table['low_prominence'] = numpy.array(low_prominence, dtype=numpy.float64)
+    peak_table['high_prominence'] = numpy.array(high_prominence, dtype=numpy.float64)
+    return peak_table
+
+
+def parameter_maps_peak_table(peak_table, parameter_maps=PARAMETER_MAPS):
+    """
+    Derive parameter maps from a peak table (see 'peak_table_image'). The peak prominence bounds used to create the
+    peak table are used to select the peaks. The results are the same as the results of 'parameter_maps_image' except
+    for the rounding of the mean peak widths and prominences.
+
+    Parameters
+    ----------
+    peak_table: Dictionary containing the peak table, e.g. the result of 'peak_table_image' or 'read_peak_table'.
+    parameter_maps: Names of the parameter maps which will be generated. See 'parameter_maps_image'.
+
+    Returns
+    -------
+    Dictionary with the names of the parameter maps as keys. Each value is a NumPy array with the shape (x, 1), or
+    (x, 3) for 'dir', where x equals the number of pixels of the peak table.
+    """
+    _check_parameter_maps(parameter_maps)
+    number_of_pixels = len(peak_table['offsets']) - 1
+    number_of_measurements = int(peak_table['number_of_measurements'])
+    low_prominence = float(peak_table['low_prominence'])
+    pixel = _peak_pixels(peak_table)
+    selected = _select_peaks(peak_table, low_prominence, float(peak_table['high_prominence']))
+    results = _peak_statistics_maps(peak_table, parameter_maps, pixel, selected, low_prominence,
+                                    number_of_measurements)
+    if any(name in ('peakdistance', 'non_crossing_dir', 'dir') for name in parameter_maps):
+        results.update(_direction_maps(parameter_maps, pixel, selected,
+                                       numpy.asarray(peak_table['corrected_position'])[selected], number_of_pixels,
+                                       number_of_measurements))
+    return {name: results[name].astype(numpy.float64).reshape(number_of_pixels, -1) for name in parameter_maps}
+
+
+def parameter_maps_sweep_peak_table(peak_table, low_prominences=(TARGET_PROMINENCE,),
+                                    target_peak_heights=(TARGET_PEAK_HEIGHT,), parameter_maps=PARAMETER_MAPS,
+                                    high_prominence=numpy.inf, centroid_calculation=True):
+    """
+    Derive parameter maps from a peak table created with centroid_windows=True (see 'peak_table_image') for every
+    combination of lower prominence bound and target peak height. The prominence bounds and the target peak height
+    used to create the peak table are ignored. The results are the same as the results of 'parameter_maps_sweep_image'
+    except for the rounding of the mean peak widths and prominences.
+
+    Parameters
+    ----------
+    peak_table: Dictionary containing the peak table with centroid windows.
+    low_prominences: Lower prominence bounds for detecting a peak.
+    target_peak_heights: Peak tip heights relative to the highest peak (see TARGET_PEAK_HEIGHT).
+    parameter_maps: Names of the parameter maps which will be generated. See 'parameter_maps_image'.
+    high_prominence: Higher prominence bound for detecting a peak.
+    centroid_calculation: Use centroid calculation to better determine the peak position regardless of the number of
+    measurements / illumination angles used.
+
+    Returns
+    -------
+    Dictionary with the tuples (low_prominence, target_peak_height) as keys. Each value is a dictionary like the
+    result of 'parameter_maps_peak_table'.
+    """
+    _check_parameter_maps(parameter_maps)
+    if centroid_calculation and any(name in ('peakdistance', 'non_crossing_dir', 'dir') for name in parameter_maps):
+        for name in CENTROID_WINDOW_FIELDS:
+            if name not in peak_table:
+                raise ValueError('The peak table does not contain the centroid windows. Create it with '
+                                 'centroid_windows=True.')
+    number_of_pixels = len(peak_table['offsets']) - 1
+    all_results = _parameter_maps_sweep_peak_table(peak_table, parameter_maps, low_prominences, target_peak_heights,
+                                                   high_prominence, centroid_calculation)
+    keys = [(low_prominence, target_peak_height) for low_prominence in low_prominences
+            for target_peak_height in target_peak_heights]
+    return {key: {name: result.astype(numpy.float64).reshape(number_of_pixels, -1)
+                  for name, result in zip(parameter_maps, results)}
+            for key, results in zip(keys, all_results)}
+
+
+def concatenate_peak_tables(peak_tables):
+    """
+    Concatenate the peak tables of consecutive parts of an SLI image series, e.g. of the bands of image rows created
+    by 'roiset_tiles'. All peak tables have to be created with the same parameters.
+
+    Parameters
+    ----------
+    peak_tables: List of dictionaries containing the peak tables (see 'peak_table_image').
+
+    Returns
+    -------
+    Dictionary containing the peak table of all pixels.
+    """
+    peak_table = {}
+    offsets = [numpy.zeros(1, dtype=numpy.intp)]
+    for table in peak_tables:
+        offsets.append(numpy.asarray(table['offsets'][1:]) + offsets[-1][-1])
+    peak_table['offsets'] = numpy.concatenate(offsets)
+    for name in PEAK_TABLE_FIELDS + CENTROID_WINDOW_FIELDS + ('max', 'min', 'avg'):
+        if name in peak_tables[0]:
+            peak_table[name] = numpy.concatenate([table[name] for table in peak_tables])
+    for name in ('number_of_measurements', 'profile_length', 'low_prominence', 'high_prominence'):
+        if name in peak_tables[0]:
+            peak_table[name] = numpy.array(peak_tables[0][name])
+    return peak_table
+
+
+def slice_peak_table(peak_table, start, stop):
+    """
+    Select the consecutive pixels start:stop of a peak table, e.g. one band of image rows of a peak table which was
+    written or cached for the whole SLI image series. Memory-mapped peak tables (see 'read_peak_table') stay
+    memory-mapped, so only the selected pixels are read from the disk.
+
+    Parameters
+    ----------
+    peak_table: Dictionary containing the peak table (see 'peak_table_image').
+    start: First pixel.
+    stop: Last pixel (exclusive).
+
+    Returns
+    -------
+    Dictionary containing the peak table of the selected pixels.
+    """
+    offsets = numpy.asarray(peak_table['offsets'][start:stop + 1])
+    peak_start, peak_stop = offsets[0], offsets[-1]
+    sliced_peak_table = {'offsets': offsets - peak_start}
+    for name, array in peak_table.items():
+        if name in PEAK_TABLE_FIELDS + CENTROID_WINDOW_FIELDS:
+            sliced_peak_table[name] = array[peak_start:peak_stop]
+        elif name in ('max', 'min', 'avg'):
+            sliced_peak_table[name] = array[start:stop]
+        elif name != 'offsets':
+            sliced_peak_table[name] = array
+    return sliced_peak_table
+
+
+def write_peak_table(path, peak_table):
+    """
+    Write a peak table into a directory containing one .npy file for each array of the peak table.
+
+    Arguments:
+        path: Path of the directory. It will be created if it does not exist.
+        peak_table: Dictionary containing the peak table (see 'peak_table_image')
+
+    Returns: None
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in peak_table.items():
+        numpy.save(os.path.join(path, name + '.npy'), numpy.asarray(array))
+
+
+def read_peak_table(path, lazy=True):
+    """
+    Read a peak table written by 'write_peak_table'.
+
+    Arguments:
+        path: Path of the directory containing the peak table
+        lazy: If True, the arrays will be memory-mapped instead of loaded into memory.
+
+    Returns:
+        Dictionary containing the peak table (see 'peak_table_image')
+    """
+    return {os.path.splitext(name)[0]: numpy.load(os.path.join(path, name), mmap_mode='r' if lazy else None)
+            for name in sorted(os.listdir(path)) if name.endswith('.npy')}
 
 
 def create_sampling(line_profile, peak_positions, left_bound, right_bound, target_peak_height,
@@ -647,13 +1749,167 @@ def centroid_correction(line_profile, peak_positions, low_prominence=TARGET_PROM
     return centroid_maxima
 
 
-def read_image(FILEPATH):
+def centroid_correction_roiset(roiset, peak_mask, low_prominence=TARGET_PROMINENCE, high_prominence=numpy.inf):
+    """
+    Correct the peak positions of all line profiles in a roiset at once. The bounds of each peak tip are chosen like in
+    'centroid_correction'. Instead of sampling the linear interpolated peak tip with NUMBER_OF_SAMPLES points per
+    measurement, the centroid of the piecewise linear peak tip is integrated exactly. Therefore, the results can differ
+    from 'centroid_correction' by about 1 / NUMBER_OF_SAMPLES.
+
+    Parameters
+    ----------
+    roiset: 2D-NumPy array with normalized line profiles (see 'normalize_roiset').
+    peak_mask: Boolean NumPy array with the same shape as the roiset marking the peaks which should be corrected.
+    low_prominence: Lower prominence bound for detecting a peak.
+    high_prominence: Higher prominence bound for detecting a peak.
+
+    Returns
+    -------
+    NumPy array with the same shape as the roiset containing the corrected position of each peak at the position of
+    the peak in the peak mask. All other entries are zero.
+    """
+    roiset = numpy.asarray(roiset, dtype=numpy.float64)
+    # Minima in the considered interval limit the peak tip
+    minimum_mask, minimum_prominence = _minima_roiset(roiset)
+    minimum_mask &= (minimum_prominence >= low_prominence) & (minimum_prominence <= high_prominence)
+    return _centroid_correction_roiset(roiset, peak_mask, minimum_mask, TARGET_PEAK_HEIGHT)
+
+
+def _minima_roiset(roiset):
+    """
+    Detect all minima of the line profiles in a roiset and calculate their prominences.
+    """
+    reverse_roiset = -1 * roiset
+    minimum_mask = all_peaks_roiset(reverse_roiset, cut_edges=False)
+    return minimum_mask, peak_prominences_roiset(reverse_roiset, minimum_mask)[0]
+
+
+def _centroid_correction_roiset(roiset, peak_mask, minimum_mask, target_peak_height_fraction):
+    """
+    Correct the peak positions like 'centroid_correction_roiset' using the given mask of prominent minima and the
+    given peak tip height.
+    """
+    pixel, peak, values, inside, minima = _centroid_windows(roiset, peak_mask, minimum_mask)
+    highest_peak = numpy.where(peak_mask, roiset, -numpy.inf).max(axis=-1)
+    target_peak_height = values[:, MAX_DISTANCE_FOR_CENTROID_ESTIMATION + 1] - \
+        highest_peak[pixel] * (1 - target_peak_height_fraction)
+    centroid_maxima = numpy.zeros(roiset.shape, dtype=numpy.float32)
+    centroid_maxima[pixel, peak] = _centroid_correction_windows(peak, values, inside, minima, target_peak_height)
+    return centroid_maxima
+
+
+def _centroid_windows(roiset, peak_mask, minimum_mask, minimum_prominence=None):
+    """
+    Gather the line profile and the minima around each peak which are needed by '_centroid_correction_windows'. The
+    windows cover the positions peak - MAX_DISTANCE_FOR_CENTROID_ESTIMATION - 1 to
+    peak + MAX_DISTANCE_FOR_CENTROID_ESTIMATION. They do not depend on the prominence bounds or the target peak height
+    and can be reused for all of them.
+
+    Returns the pixel and position of each peak, the values of the line profile (clipped to the line profile), whether
+    each position lies inside the line profile and the minima. The minima are a boolean mask or, if
+    minimum_prominence is given, the prominences of the minima and NaN for all other positions.
+    """
+    profile_length = roiset.shape[-1]
+    pixel, peak = numpy.nonzero(peak_mask)
+    positions = peak[:, numpy.newaxis] + numpy.arange(-MAX_DISTANCE_FOR_CENTROID_ESTIMATION - 1,
+                                                      MAX_DISTANCE_FOR_CENTROID_ESTIMATION + 1)
+    inside = (positions >= 0) & (positions < profile_length)
+    # Flat indices into the roiset are faster than indexing with the pixel and the (clipped) position
+    flat_index = pixel[:, numpy.newaxis] * profile_length + numpy.minimum(numpy.maximum(positions, 0),
+                                                                          profile_length - 1)
+    values = roiset.reshape(-1)[flat_index]
+    minima = inside & minimum_mask.reshape(-1)[flat_index]
+    if minimum_prominence is not None:
+        minima = numpy.where(minima, minimum_prominence.reshape(-1)[flat_index], numpy.nan)
+    return pixel, peak, values, inside, minima
+
+
+def _centroid_correction_windows(peak, values, inside, minima, target_peak_height):
+    """
+    Correct the peak positions like 'centroid_correction_roiset' using the windows created by '_centroid_windows'.
+    minima has to be the boolean mask of the prominent minima. Returns the corrected position of each peak.
+    """
+    # Column of the peak in the windows
+    center = MAX_DISTANCE_FOR_CENTROID_ESTIMATION + 1
+
+    def value_at(position):
+        return numpy.take_along_axis(values, (position - peak + center)[:, numpy.newaxis], axis=-1)[:, 0]
+
+    def below_target(distance):
+        return inside[:, center + distance] & (values[:, center + distance] < target_peak_height)
+
+    # Check for minima in left and set left position accordingly. The nearest minimum is used.
+    left_position = peak.copy()
+    for distance in range(MAX_DISTANCE_FOR_CENTROID_ESTIMATION, 0, -1):
+        left_position = numpy.where(minima[:, center - distance], peak - distance, left_position)
+    # Look for peak height
+    temp_left_position = peak - MAX_DISTANCE_FOR_CENTROID_ESTIMATION
+    for distance in range(MAX_DISTANCE_FOR_CENTROID_ESTIMATION, 0, -1):
+        temp_left_position = numpy.where(below_target(-distance), peak - distance, temp_left_position)
+    left_position = numpy.minimum(left_position, temp_left_position)
+
+    # Repeat for right bound. Here, the farthest minimum is used like in 'centroid_correction'.
+    right_position = peak.copy()
+    for distance in range(1, MAX_DISTANCE_FOR_CENTROID_ESTIMATION + 1):
+        right_position = numpy.where(minima[:, center + distance], peak + distance, right_position)
+    temp_right_position = peak + MAX_DISTANCE_FOR_CENTROID_ESTIMATION
+    for distance in range(MAX_DISTANCE_FOR_CENTROID_ESTIMATION - 1, -1, -1):
+        temp_right_position = numpy.where(below_target(distance),
+                                          peak + MAX_DISTANCE_FOR_CENTROID_ESTIMATION - distance, temp_right_position)
+    right_position = numpy.maximum(right_position, temp_right_position)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        # The peak tip starts where the interpolated line profile crosses the target peak height for the last time
+        # before the peak and ends where it crosses the target peak height for the first time after the peak.
+        left_crossing = left_position.astype(numpy.float64)
+        for distance in range(MAX_DISTANCE_FOR_CENTROID_ESTIMATION + 1, 0, -1):
+            position = peak - distance
+            value = values[:, center - distance]
+            crossing = position + (target_peak_height - value) / (values[:, center - distance + 1] - value)
+            left_crossing = numpy.where((position >= left_position - 1) & below_target(-distance),
+                                        crossing, left_crossing)
+        left_crossing = numpy.where(value_at(left_position) > target_peak_height, left_position, left_crossing)
+
+        right_crossing = right_position.astype(numpy.float64)
+        for distance in range(MAX_DISTANCE_FOR_CENTROID_ESTIMATION, 0, -1):
+            position = peak + distance
+            previous_value = values[:, center + distance - 1]
+            crossing = position - 1 + (previous_value - target_peak_height) / \
+                (previous_value - values[:, center + distance])
+            right_crossing = numpy.where((position <= right_position) & below_target(distance),
+                                         crossing, right_crossing)
+        right_crossing = numpy.where(value_at(right_position) > target_peak_height, right_position, right_crossing)
+
+        # Integrate the linear interpolated line profile between both crossings segment by segment
+        area = numpy.zeros(len(peak), dtype=numpy.float64)
+        moment = numpy.zeros(len(peak), dtype=numpy.float64)
+        for offset in range(-MAX_DISTANCE_FOR_CENTROID_ESTIMATION - 1, MAX_DISTANCE_FOR_CENTROID_ESTIMATION):
+            position = peak + offset
+            start = numpy.maximum(left_crossing, position)
+            end = numpy.minimum(right_crossing, position + 1)
+            segment_length = numpy.maximum(end - start, 0)
+            value = values[:, center + offset]
+            slope = values[:, center + offset + 1] - value
+            start_value = value + slope * (start - position)
+            end_value = value + slope * (end - position)
+            area += segment_length * (start_value + end_value) / 2
+            moment += segment_length * ((2 * start + end) * start_value + (start + 2 * end) * end_value) / 6
+        centroid = moment / area
+
+    # Move at max one step size on the x-coordinate axis to the left or right to prevent too much movement
+    return numpy.where(numpy.abs(centroid - peak) > 1, peak + numpy.sign(centroid - peak), centroid)
+
+
+def read_image(FILEPATH, lazy=False):
     """
     Reads image file and returns it.
     Supported file formats: NIfTI, Tiff.
 
     Arguments:
         FILEPATH: Path to image
+        lazy: If True, uncompressed image files will be memory-mapped instead of loaded into memory. The image keeps
+              its native data type and only the pixels which are accessed will be read from disk. Files which cannot
+              be memory-mapped are loaded with their native data type.
 
     Returns:
         numpy.array: Image with shape [x, y, z] where [x, y] is the size of a single image and z specifies the number
@@ -661,10 +1917,22 @@ def read_image(FILEPATH):
     """
     # Load NIfTI dataset
     if FILEPATH.endswith('.nii'):
-        data = nibabel.load(FILEPATH).get_fdata()
+        if lazy:
+            # Unscaled and uncompressed data is returned as a memory map by nibabel
+            data = numpy.asanyarray(nibabel.load(FILEPATH, mmap='r').dataobj)
+        else:
+            data = nibabel.load(FILEPATH).get_fdata()
         data = numpy.squeeze(numpy.swapaxes(data, 0, 1))
     elif FILEPATH.endswith('.tif') or FILEPATH.endswith('.tiff'):
-        data = tifffile.imread(FILEPATH)
+        data = None
+        if lazy:
+            try:
+                data = tifffile.memmap(FILEPATH, mode='r')
+            except ValueError:
+                # Compressed or non-contiguous image data cannot be memory-mapped
+                pass
+        if data is None:
+            data = tifffile.imread(FILEPATH)
         data = numpy.squeeze(numpy.moveaxis(data, 0, -1))
     else:
         raise ValueError('Datatype not supported. Expected .nii or .tiff/.tif file with three dimensions.')
@@ -674,6 +1942,77 @@ def read_image(FILEPATH):
     return data
 
 
+def write_parameter_maps(FILEPATH, parameter_maps, roisize=1, compression='zlib', tile_size=None):
+    """
+    Write parameter maps into one tiled BigTIFF container with one compressed page per parameter map. Each page is
+    named after its parameter map, so single parameter maps or tiles of them can be read without decoding the other
+    pages (see 'read_parameter_map'). Integer parameter maps like the number of peaks are stored with the smallest
+    signed integer type holding their values, all other parameter maps keep their data type.
+
+    Arguments:
+        FILEPATH: Path of the .tiff container
+        parameter_maps: Dictionary (or iterable of pairs) with the names and the two-dimensional parameter maps
+        roisize: Roisize used to generate the parameter maps. It is stored in the metadata of each page.
+        compression: Compression of the tiles, e.g. 'zlib' or 'lzma'. None writes uncompressed tiles.
+        tile_size: Edge length of the tiles in pixels (a multiple of 16). If None, PARAMETER_MAP_TILE_SIZE is used.
+
+    Returns: None
+    """
+    if tile_size is None:
+        tile_size = PARAMETER_MAP_TILE_SIZE
+    if isinstance(parameter_maps, dict):
+        parameter_maps = parameter_maps.items()
+    with tifffile.TiffWriter(FILEPATH, bigtiff=True) as tiff:
+        for name, parameter_map in parameter_maps:
+            parameter_map = numpy.asarray(parameter_map)
+            if numpy.issubdtype(parameter_map.dtype, numpy.integer) and parameter_map.size > 0:
+                # Negative bounds make min_scalar_type return signed types
+                dtype = numpy.result_type(numpy.min_scalar_type(min(int(parameter_map.min()), -1)),
+                                          numpy.min_scalar_type(-int(parameter_map.max()) - 1))
+                parameter_map = parameter_map.astype(dtype, copy=False)
+            tiff.write(parameter_map, tile=(tile_size, tile_size), compression=compression,
+                       metadata={'name': name, 'roisize': roisize})
+
+
+def parameter_map_names(FILEPATH):
+    """
+    Arguments:
+        FILEPATH: Path of a container written by 'write_parameter_maps'
+
+    Returns:
+        List of the names of the parameter maps in the container
+    """
+    with tifffile.TiffFile(FILEPATH) as tiff:
+        return [metadata['name'] for metadata in tiff.shaped_metadata]
+
+
+def read_parameter_map(FILEPATH, name, rows=None, columns=None):
+    """
+    Read one parameter map from a container written by 'write_parameter_maps'. If zarr is installed, only the tiles
+    overlapping the requested region are read from the disk and decoded. Otherwise, the whole parameter map is decoded.
+    The other parameter maps of the container are never decoded.
+
+    Arguments:
+        FILEPATH: Path of the container
+        name: Name of the parameter map
+        rows: Slice of the image rows which will be read. If None, all rows will be read.
+        columns: Slice of the image columns which will be read. If None, all columns will be read.
+
+    Returns:
+        numpy.array: Requested region of the parameter map with its stored data type
+    """
+    region = (rows if rows is not None else slice(None), columns if columns is not None else slice(None))
+    with tifffile.TiffFile(FILEPATH) as tiff:
+        names = [metadata['name'] for metadata in tiff.shaped_metadata]
+        if name not in names:
+            raise ValueError('Parameter map ' + str(name) + ' not found. Available parameter maps: ' + str(names))
+        series = tiff.series[names.index(name)]
+        if zarr is None:
+            return series.asarray()[region]
+        with series.aszarr() as store:
+            return numpy.asarray(zarr.open(store, mode='r')[region])
+
+
 def create_background_mask(IMAGE, threshold=10):
     """
     Creates a background mask by setting all image pixels with low scattering signals to zero. As all background pixels are near zero for all images in the SLI image stack, this method should remove most of the background allowing for better approximations using the
@@ -692,7 +2031,7 @@ def create_background_mask(IMAGE, threshold=10):
     return mask
 
 
-def create_roiset(IMAGE, ROISIZE=1, extend=True):
+def create_roiset(IMAGE, ROISIZE=1, extend=True, backend=None, progress_callback=None):
     """
     Create roi set of the given image by creating an image containing the average value of pixels within the
     specified ROISIZE. The returned image will have twice the size in the third axis as the both halfs will be doubled
@@ -701,6 +2040,12 @@ def create_roiset(IMAGE, ROISIZE=1, extend=True):
     Arguments:
         IMAGE: Image containing multiple images in a 3D-stack
         ROISIZE: Size in pixels which are used to create the region of interest image
+        extend: Extend the line profiles by their periodic continuation. If False and ROISIZE == 1, the returned
+                roiset is a view of the image without any copy. Such a roiset can be extended chunk by chunk with
+                'extend_roiset' or by the 'extend' parameter of 'parameter_maps_image'.
+        backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
+        progress_callback: Function which will be called with the progress events (stage, done, total). If None,
+                           PROGRESS_CALLBACK will be used.
 
     Returns:
         numpy.array: Image with shape [x/ROISIZE, y/ROISIZE, 2*'number of measurements'] containing the average value
@@ -713,59 +2058,169 @@ def create_roiset(IMAGE, ROISIZE=1, extend=True):
     nx = numpy.ceil(x / ROISIZE).astype('int')
     ny = numpy.ceil(y / ROISIZE).astype('int')
 
+    # ROISIZE == 1 is exactly the same as the original image
+    if ROISIZE == 1:
+        roi_set = IMAGE.reshape((nx * ny, number_of_measurements))
+        if extend:
+            roi_set = extend_roiset(roi_set)
+        return roi_set
+
     if extend:
-        roi_set = pymp.shared.array((nx * ny, 2 * number_of_measurements), dtype='float32')
+        roi_set = shared_array((nx * ny, 2 * number_of_measurements), 'float32', backend)
     else:
-        roi_set = pymp.shared.array((nx * ny, number_of_measurements), dtype='float32')
+        roi_set = shared_array((nx * ny, number_of_measurements), 'float32', backend)
+
+    # Start and width of each ROI along the y-axis. The last ROI might be smaller than ROISIZE.
+    roi_starts = numpy.arange(0, y, ROISIZE)
+    roi_widths = numpy.minimum(roi_starts + ROISIZE, y) - roi_starts
+
+    def average_rois(i):
+        # Create average of all ROIs in this row at once and append two halfs to the front and back
+        rows = IMAGE[ROISIZE * i:ROISIZE * i + ROISIZE, :, :]
+        roi_sums = numpy.add.reduceat(numpy.sum(rows, axis=0, dtype=numpy.float64), roi_starts, axis=0)
+        average_per_dimension = roi_sums / (rows.shape[0] * roi_widths)[:, numpy.newaxis]
+        if extend:
+            average_per_dimension = extend_roiset(average_per_dimension)
+        roi_set[i * ny:i * ny + ny] = average_per_dimension
+
+    parallel_for(average_rois, 0, nx, 1, backend, 'Create roiset', progress_callback)
+    return roi_set
 
-    # ROISIZE == 1 is exactly the same as the original image
-    if ROISIZE > 1:
-        with pymp.Parallel(CPU_COUNT) as p:
-            for i in p.range(0, nx):
-                for j in range(0, ny):
-                    # Create average of selected ROI and append two halfs to the front and back
-                    roi = IMAGE[ROISIZE * i:ROISIZE * i + ROISIZE, ROISIZE * j:ROISIZE * j + ROISIZE, :]
-                    average_per_dimension = numpy.average(numpy.average(roi, axis=1), axis=0).flatten()
-                    if extend:
-                        average_per_dimension = numpy.concatenate(
-                            (average_per_dimension[-number_of_measurements // 2:], average_per_dimension,
-                             average_per_dimension[:number_of_measurements // 2]))
-                    roi_set[i * ny + j] = average_per_dimension
-    else:
-        with pymp.Parallel(CPU_COUNT) as p:
-            for i in p.range(0, nx):
-                for j in range(0, ny):
-                    roi = IMAGE[i, j, :]
-                    if extend:
-                        roi = numpy.concatenate((roi[-number_of_measurements // 2:], roi,
-                                                 roi[:number_of_measurements // 2]))
-                    roi_set[i * ny + j] = roi
 
-    return roi_set
+def extend_roiset(roiset):
+    """
+    Extend all line profiles of a roiset by their periodic continuation like 'create_roiset' does. The last half of
+    each line profile is appended to the front and the first half to the back.
+
+    Arguments:
+        roiset: Roiset created with 'create_roiset' and extend=False
+
+    Returns:
+        numpy.array: Roiset with twice the number of measurements in the last axis
+    """
+    number_of_measurements = roiset.shape[-1]
+    last_half = roiset[:, -number_of_measurements // 2:]
+    start = last_half.shape[-1]
+    extended_roiset = numpy.empty((roiset.shape[0], 2 * number_of_measurements), dtype='float32')
+    extended_roiset[:, :start] = last_half
+    extended_roiset[:, start:start + number_of_measurements] = roiset
+    extended_roiset[:, start + number_of_measurements:] = roiset[:, :number_of_measurements // 2]
+    return extended_roiset
 
 
-def smooth_roiset(roiset, range=45, polynom_order=2):
+def tile_rows(image_shape, ROISIZE=1, max_memory=None, buffered_bands=0):
     """
-    Applies Savitzky-Golay filter to given roiset and returns the smoothened measurement.
+    Calculate the number of image rows which can be processed at once without exceeding the given memory limit.
+    The estimation includes the image rows themselves, the resulting roiset (and a smoothed copy of it), all parameter
+    maps of those rows and the intermediate results of the chunks which are evaluated in parallel.
+
+    Arguments:
+        image_shape: Shape [x, y, z] of the SLI image stack
+        ROISIZE: Size in pixels which are used to create the region of interest image
+        max_memory: Memory limit in bytes. If None, all rows will be processed at once.
+        buffered_bands: Number of additional bands which are held in memory while a band is processed, e.g. the bands
+        read in advance by 'prefetch'. Each of them is counted with its image rows and its parameter maps.
+
+    Returns:
+        int: Number of image rows. This is always a multiple of ROISIZE so that no region of interest is split.
+    """
+    x, y, number_of_measurements = image_shape[:3]
+    if max_memory is None:
+        return x
+    ny = numpy.ceil(y / ROISIZE).astype('int')
+    bytes_per_buffered_roi_row = ROISIZE * y * number_of_measurements * 8 + ny * (len(PARAMETER_MAPS) + 2) * 8
+    bytes_per_roi_row = ROISIZE * y * number_of_measurements * 8 + \
+        ny * (2 * 2 * number_of_measurements * 4 + (len(PARAMETER_MAPS) + 2) * 8) + \
+        buffered_bands * bytes_per_buffered_roi_row
+    bytes_per_chunk = CHUNK_SIZE * 2 * number_of_measurements * BYTES_PER_CHUNK_SAMPLE
+    roi_rows = (max_memory - CPU_COUNT * bytes_per_chunk) // bytes_per_roi_row
+    if roi_rows < 1:
+        raise ValueError('Memory limit too small. At least ' +
+                         str(CPU_COUNT * bytes_per_chunk + bytes_per_roi_row) + ' bytes are needed.')
+    return int(min(roi_rows * ROISIZE, x))
+
+
+def shard_rows(image_shape, shard, number_of_shards, ROISIZE=1):
+    """
+    Calculate the image rows of one shard when an SLI image stack is split into bands of image rows which are
+    evaluated independently, e.g. on different machines. The regions of interest are distributed evenly over the
+    shards.
+
+    Arguments:
+        image_shape: Shape [x, y, z] of the SLI image stack
+        shard: Index of the shard starting with 0
+        number_of_shards: Total number of shards
+        ROISIZE: Size in pixels which are used to create the region of interest image
+
+    Returns:
+        tuple: First and last (exclusive) image row of the shard. Both are multiples of ROISIZE except for the end of
+               the image so that no region of interest is split.
+    """
+    roi_rows = numpy.ceil(image_shape[0] / ROISIZE).astype('int')
+    if not 0 < number_of_shards <= roi_rows:
+        raise ValueError('The number of shards has to be between 1 and the number of image rows (' + str(roi_rows) +
+                         ' for a roisize of ' + str(ROISIZE) + ').')
+    if not 0 <= shard < number_of_shards:
+        raise ValueError('The shard index has to be between 0 and ' + str(number_of_shards - 1) + '.')
+    row_start = shard * roi_rows // number_of_shards * ROISIZE
+    row_stop = min((shard + 1) * roi_rows // number_of_shards * ROISIZE, image_shape[0])
+    return int(row_start), int(row_stop)
+
+
+def roiset_tiles(IMAGE, ROISIZE=1, max_memory=None, extend=True):
+    """
+    Split the SLI image stack into bands of image rows and create the roiset of each band. Only one band is held in
+    memory at a time which allows the evaluation of measurements which do not fit into memory when combined with
+    a lazily loaded image stack.
+
+    Arguments:
+        IMAGE: Image containing multiple images in a 3D-stack
+        ROISIZE: Size in pixels which are used to create the region of interest image
+        max_memory: Memory limit in bytes used to determine the size of the bands. See 'tile_rows'.
+        extend: Extend the line profiles like 'create_roiset' does.
+
+    Returns:
+        Generator yielding the first row, the last row (exclusive) and the roiset of each band.
+    """
+    rows = tile_rows(IMAGE.shape, ROISIZE, max_memory)
+    for row_start in range(0, IMAGE.shape[0], rows):
+        tile = numpy.asarray(IMAGE[row_start:row_start + rows])
+        yield row_start, row_start + tile.shape[0], create_roiset(tile, ROISIZE, extend)
+
+
+def smooth_roiset(roiset, range=45, polynom_order=2, extend=False, backend=None, progress_callback=None):
+    """
+    Applies Savitzky-Golay filter to given roiset and returns the smoothened measurement. The line profiles are
+    treated as circular signals.
 
     Args:
         roiset: Flattened image with the dimensions [x*y, z] where z equals the number of measurements
         range: Used window length for the Savitzky-Golay filter
         polynom_order: Used polynomial order for the Savitzky-Golay filter
+        extend: Extend the line profiles after smoothing them like 'create_roiset' does. Use this for roisets created
+                with extend=False to avoid smoothing the duplicated parts of the extended line profiles.
+        backend: Execution backend ('process', 'thread' or 'serial'). If None, EXECUTION_BACKEND will be used.
+        progress_callback: Function which will be called with the progress events (stage, done, total). If None,
+                           PROGRESS_CALLBACK will be used.
 
-    Returns: Line profiles with applied Savitzky-Golay filter and the same shape as the original roi set.
+    Returns: Line profiles with applied Savitzky-Golay filter and the same shape as the original roi set (or twice the
+    number of measurements if extend is True).
 
     """
-    roiset_rolled = pymp.shared.array(roiset.shape, dtype='float32')
-    with pymp.Parallel(CPU_COUNT) as p:
-        for i in p.range(len(roiset)):
-            roi = roiset[i]
-            # Extension of the range to include circularity.
-            roi_c = numpy.concatenate((roi, roi, roi))
-            roi_rolled = savgol_filter(roi_c, range, polynom_order)
-            # Shrink array back down to it's original size
-            roi_rolled = roi_rolled[len(roi):-len(roi)]
-            roiset_rolled[i] = roi_rolled
+    if extend:
+        roiset_rolled = shared_array((roiset.shape[0], 2 * roiset.shape[-1]), 'float32', backend)
+    else:
+        roiset_rolled = shared_array(roiset.shape, 'float32', backend)
+
+    def smooth_chunk(chunk_start):
+        chunk = roiset[chunk_start:chunk_start + CHUNK_SIZE]
+        # Wrapping the line profiles around includes their circularity.
+        chunk_rolled = savgol_filter(chunk, range, polynom_order, axis=-1, mode='wrap')
+        if extend:
+            chunk_rolled = extend_roiset(chunk_rolled)
+        roiset_rolled[chunk_start:chunk_start + len(chunk)] = chunk_rolled
+
+    parallel_for(smooth_chunk, 0, len(roiset), CHUNK_SIZE, backend, 'Smoothing', progress_callback)
     return roiset_rolled
 
 
@@ -796,6 +2251,35 @@ def normalize(roi, kind_of_normalization=0):
     return roi
 
 
+def normalize_roiset(roiset, kind_of_normalization=0):
+    """
+    Normalize all line profiles of a roiset like 'normalize' does for a single line profile.
+
+    0 : Scale line profile to be between 0 and 1
+    1 : Divide line profile through its mean value
+
+    Arguments:
+        roiset: 2D-NumPy array with the shape (number of pixels, number of points in one line profile)
+        kind_of_normalization: Normalization technique which will be used for the calculation
+
+    Returns:
+        numpy.array -- Normalized line profiles with the same shape as the roiset
+    """
+    roiset = numpy.array(roiset, dtype='float32')
+    roi_min = roiset.min(axis=-1, keepdims=True)
+    roi_max = roiset.max(axis=-1, keepdims=True)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        if kind_of_normalization == 0:
+            normalized_roiset = (roiset - roi_min) / (roi_max - roi_min)
+        elif kind_of_normalization == 1:
+            normalized_roiset = roiset / numpy.mean(roiset, axis=-1, keepdims=True)
+    # Line profiles without any change will be set to one. Line profiles containing only zeros are kept.
+    constant = (roi_max == roi_min)[..., 0]
+    normalized_roiset[constant] = 1
+    normalized_roiset[constant & (roi_max[..., 0] == 0)] = 0
+    return normalized_roiset
+
+
 def reshape_array_to_image(image, x, ROISIZE):
     """
     Convert array back to image keeping the lower resolution based on the ROISIZE.
@@ -1,11 +1,13 @@
 import numpy
-import pymp
+import tifffile
 from matplotlib import pyplot as plt
+from matplotlib.collections import LineCollection
 from PIL import Image
 import copy
 from . import toolbox
 
-CPU_COUNT = toolbox.CPU_COUNT
+# Number of image pixels which are downsampled at once by 'downsample'
+DOWNSAMPLE_CHUNK_SIZE = 2 ** 22
 
 
 def unit_vectors(directions):
@@ -32,7 +34,27 @@ def unit_vectors(directions):
     return UnitX, UnitY
 
 
-def downsample(image, kernel_size, background_value=-1, background_threshold=0.5):
+def direction_angles(UnitX, UnitY, background_value=-1):
+    """
+    Calculate the direction angles from given unit vectors. This is the inverse of 'unit_vectors'.
+
+    Parameters
+    ----------
+    UnitX: Unit vector components along the x-axis (2D or 3D NumPy array).
+    UnitY: Unit vector components along the y-axis (2D or 3D NumPy array).
+    background_value: Direction angle of pixels without vector.
+
+    Returns
+    -------
+    NumPy array with the direction angles in degrees between 0 and 180.
+    """
+    directions = numpy.rad2deg(numpy.arctan2(UnitY, -numpy.asarray(UnitX))) % 180
+    directions[numpy.logical_and(UnitX == 0, UnitY == 0)] = background_value
+    return directions
+
+
+def downsample(image, kernel_size, background_value=-1, background_threshold=0.5, backend=None,
+               progress_callback=None):
     """
     Reduce image dimensions of a parameter map by replacing (N x N) pixels by their median value for each image.
     Image pixels with undefined values (background) will not be considered for computing the median, 
@@ -45,33 +67,58 @@ def downsample(image, kernel_size, background_value=-1, background_threshold=0.5
     background_value: Background value of the parameter map. This is generally -1 but can differ for unit vector maps.
     background_threshold: Fraction of background pixels in the considered (N x N) area for which the image pixels are set to background_value. 
     If the fraction of background pixels lies below this defined threshold, background pixels will not be considered for computing the median.
+    backend: Execution backend ('process', 'thread' or 'serial'). If None, SLIX.toolbox.EXECUTION_BACKEND will be used.
+    progress_callback: Function which will be called with the progress events (stage, done, total). If None,
+    SLIX.toolbox.PROGRESS_CALLBACK will be used.
     
     Returns
     -------
     2D or 3D NumPy array with reduced image dimensions.
     """
     image = numpy.array(image)
-    # downsample image
     if len(image.shape) == 2:
-        x, y = image.shape
-        z = 1
-    else:
-        x, y, z = image.shape
+        image = image[..., numpy.newaxis]
+    x, y, z = image.shape
 
     nx = numpy.ceil(x / kernel_size).astype('int')
     ny = numpy.ceil(y / kernel_size).astype('int')
-    small_img = pymp.shared.array((nx, ny, z), dtype='float32')
-
-    for sub_image in range(z):
-        with pymp.Parallel(CPU_COUNT) as p:
-            for i in p.range(0, nx):
-                for j in range(0, ny):
-                    roi = image[kernel_size * i:kernel_size * i + kernel_size,
-                                kernel_size * j:kernel_size * j + kernel_size, sub_image]
-                    if numpy.count_nonzero(roi == background_value) < background_threshold * roi.size:
-                        small_img[i, j, sub_image] = numpy.median(roi[roi != background_value])
-                    else:
-                        small_img[i, j, sub_image] = background_value
+    small_img = toolbox.shared_array((nx, ny, z), 'float32', backend)
+    # Number of block rows processed at once. This limits the memory used for sorting the blocks.
+    rows_per_chunk = max(1, DOWNSAMPLE_CHUNK_SIZE // (ny * z * kernel_size ** 2))
+
+    def downsample_rows(i):
+        rows = image[kernel_size * i:kernel_size * (i + rows_per_chunk)]
+        number_of_rows = numpy.ceil(rows.shape[0] / kernel_size).astype('int')
+        # Pad the image to a multiple of the kernel size. Padded pixels are neither background nor foreground.
+        blocks = numpy.full((number_of_rows * kernel_size, ny * kernel_size, z), numpy.nan)
+        blocks[:rows.shape[0], :y] = rows
+        padding = numpy.ones(blocks.shape, dtype=bool)
+        padding[:rows.shape[0], :y] = False
+        # Shape [nx, ny, z, kernel_size ** 2] with all pixels of each block in the last axis
+        blocks = blocks.reshape((number_of_rows, kernel_size, ny, kernel_size, z)) \
+            .transpose((0, 2, 4, 1, 3)).reshape((number_of_rows, ny, z, -1))
+        padding = padding.reshape((number_of_rows, kernel_size, ny, kernel_size, z)) \
+            .transpose((0, 2, 4, 1, 3)).reshape((number_of_rows, ny, z, -1))
+
+        background = blocks == background_value
+        block_size = numpy.count_nonzero(~padding, axis=-1)
+        number_of_background_pixels = numpy.count_nonzero(background, axis=-1)
+        foreground = ~(background | padding)
+        # numpy.median returns NaN if any considered pixel is NaN
+        contains_nan = numpy.any(numpy.isnan(blocks) & foreground, axis=-1)
+
+        # Masked median: NaN values are sorted to the end, followed by the median of the foreground pixels
+        blocks[~foreground] = numpy.nan
+        blocks.sort(axis=-1)
+        number_of_foreground_pixels = block_size - number_of_background_pixels
+        lower = numpy.take_along_axis(blocks, ((number_of_foreground_pixels - 1) // 2)[..., numpy.newaxis], axis=-1)
+        upper = numpy.take_along_axis(blocks, (number_of_foreground_pixels // 2)[..., numpy.newaxis], axis=-1)
+        median = ((lower + upper) / 2)[..., 0]
+        median[contains_nan] = numpy.nan
+        median[number_of_background_pixels >= background_threshold * block_size] = background_value
+        small_img[i:i + number_of_rows] = median
+
+    toolbox.parallel_for(downsample_rows, 0, nx, rows_per_chunk, backend, 'Downsampling', progress_callback)
 
     if z == 1:
         small_img = small_img.reshape((nx, ny))
@@ -115,9 +162,10 @@ def visualize_parameter_map(parameter_map, fig=None, ax=None, alpha=1,
     return fig, ax
 
 
-def visualize_unit_vectors(UnitX, UnitY, thinout=1, ax=None, alpha=1, background_threshold=0.5):
+def visualize_unit_vectors(UnitX, UnitY, thinout=1, ax=None, alpha=1, background_threshold=0.5, linewidth=1,
+                           rasterized=False):
     """
-    This method will create a Matplotlib plot based on quiver to represent the given unit vectors as colored lines (vector map). 
+    This method will create a Matplotlib plot based on a line collection to represent the given unit vectors as colored lines (vector map).
     Parameters like thinout can be used to reduce the computing load. If thinout = 1, the resulting vectors might not be visible 
     without zooming in significantly. Here, the vectors will only be plotted to the current axis. To show the results, please use pyplot.show().
 
@@ -126,12 +174,15 @@ def visualize_unit_vectors(UnitX, UnitY, thinout=1, ax=None, alpha=1, background
     UnitX: Unit vector components along the x-axis (3D NumPy array).
     UnitY: Unit vector components along the y-axis (3D NumPy array).
     thinout: Downsampling parameter N (defines how many vectors N x N are replaced by one vector using the downsample function). 
-    Unit vectors will be thinned out using downsampling and thinning in combination. This will increase the
+    Each vector is drawn on the downsampled grid with a length of N pixels. This will increase the
     vector size in the resulting image but will also reduce the information density. Please use with caution.
     ax: Matplotlib axis. If None, the current context axis will be used.
     alpha: Apply alpha to Matplotlib plots to overlay them with some other other image like the averaged transmitted light intensity.
     background_threshold: If the fraction of background pixels (number of pixels without vector within N x N pixels) exceeds this threshold, 
     the downsampled pixel will not show a vector.
+    linewidth: Width of the vectors in points.
+    rasterized: Rasterize the vectors when saving the figure in a vector graphics format. This keeps the file size and
+    the rendering time small for vector maps of whole sections.
 
     Returns
     -------
@@ -141,43 +192,120 @@ def visualize_unit_vectors(UnitX, UnitY, thinout=1, ax=None, alpha=1, background
     if ax is None:
         ax = plt.gca()
 
-    thinout = int(thinout)
-    if thinout <= 1:
-        thinout = 1
-    else:
-        UnitX = UnitX.copy()
-        UnitY = UnitY.copy()
-        original_size = UnitX.shape[:-1]
-        small_unit_x = downsample(UnitX, thinout, background_value=0, background_threshold=background_threshold)
-        for i in range(UnitX.shape[-1]):
-            UnitX[:, :, i] = numpy.array(Image.fromarray(small_unit_x[:, :, i])
-                                         .resize(original_size[::-1], resample=Image.NEAREST))
-        small_unit_y = downsample(UnitY, thinout, background_value=0, background_threshold=background_threshold)
-        for i in range(UnitY.shape[-1]):
-            UnitY[:, :, i] = numpy.array(Image.fromarray(small_unit_y[:, :, i])
-                                         .resize(original_size[::-1], resample=Image.NEAREST))
-        del original_size
-        del small_unit_y
-        del small_unit_x
-    skip = (slice(None, None, thinout), slice(None, None, thinout))
-
-    for i in range(UnitX.shape[-1]):
-        mesh_x, mesh_y = numpy.meshgrid(numpy.arange(0, UnitX.shape[1]), numpy.arange(0, UnitX.shape[0]))
-        mesh_u = UnitX[:, :, i]
-        mesh_v = UnitY[:, :, i]
-
-        mask = numpy.logical_or(mesh_u[skip] != 0, mesh_v[skip] != 0)
-        mesh_x = mesh_x[skip][mask]
-        mesh_y = mesh_y[skip][mask]
-        mesh_u = mesh_u[skip][mask]
-        mesh_v = mesh_v[skip][mask]
-
-        # Normalize the arrows:
-        mesh_u_normed = thinout * mesh_u / numpy.sqrt(mesh_u ** 2 + mesh_v ** 2)
-        mesh_v_normed = thinout * mesh_v / numpy.sqrt(mesh_u ** 2 + mesh_v ** 2)
-
-        ax.quiver(mesh_x, mesh_y, mesh_u_normed, mesh_v_normed, numpy.arctan2(mesh_v_normed, mesh_u_normed),
-                   cmap='hsv', angles='xy', scale_units='xy', scale=1, alpha=alpha,
-                   headwidth=0, headlength=0, headaxislength=0, minlength=0, pivot='mid', clim=(0, numpy.pi))
+    thinout = max(int(thinout), 1)
+    if thinout > 1:
+        # Both components are downsampled at once. Pixels without vector have the value 0 in both maps.
+        small_unit_vectors = downsample(numpy.concatenate((UnitX, UnitY), axis=-1), thinout, background_value=0,
+                                        background_threshold=background_threshold)
+        UnitX = small_unit_vectors[:, :, :UnitX.shape[-1]]
+        UnitY = small_unit_vectors[:, :, UnitX.shape[-1]:]
+
+    # Position of each vector in the original image. The vector of a downsampled pixel is placed at the first pixel of
+    # its N x N area.
+    mask = numpy.logical_or(UnitX != 0, UnitY != 0)
+    position_y, position_x, _ = numpy.nonzero(mask)
+    position_x = position_x * thinout
+    position_y = position_y * thinout
+    mesh_u = UnitX[mask]
+    mesh_v = UnitY[mask]
+
+    # Normalize the vectors to a length of N pixels
+    length = numpy.sqrt(mesh_u ** 2 + mesh_v ** 2)
+    mesh_u_normed = thinout * mesh_u / length
+    mesh_v_normed = thinout * mesh_v / length
+
+    # Each vector is a line centered on its position
+    segments = numpy.empty((len(position_x), 2, 2))
+    segments[:, 0, 0] = position_x - mesh_u_normed / 2
+    segments[:, 0, 1] = position_y - mesh_v_normed / 2
+    segments[:, 1, 0] = position_x + mesh_u_normed / 2
+    segments[:, 1, 1] = position_y + mesh_v_normed / 2
+    lines = LineCollection(segments, cmap='hsv', linewidths=linewidth, alpha=alpha, rasterized=rasterized)
+    lines.set_array(numpy.arctan2(mesh_v_normed, mesh_u_normed))
+    lines.set_clim(0, numpy.pi)
+    # Like for quiver plots, only the positions of the vectors are considered for the axis limits
+    ax.add_collection(lines, autolim=False)
+    ax.update_datalim(numpy.column_stack((position_x, position_y)))
+    ax.autoscale_view()
     return ax
 
+
+# Direction shown in each of the 2 x 2 subpixels of 'fiber_orientation_map' depending on the number of directions of a
+# pixel. -1 marks black subpixels.
+SUBPIXEL_DIRECTIONS = numpy.array([[-1, -1, -1, -1],
+                                   [0, 0, 0, 0],
+                                   [0, 1, 1, 0],
+                                   [0, 1, 2, -1]])
+
+
+def fiber_orientation_map(directions, weights=None, background_value=-1, path=None):
+    """
+    Create a color-coded fiber orientation map (RGB image) from direction maps, e.g. dir_1, dir_2 and dir_3 of
+    SLIXParameterGenerator. The direction angle determines the hue (0° red, 60° green, 120° blue) with full
+    saturation. The brightness is given by the weights, e.g. the average or peakprominence map. Pixels without
+    direction are black. When more than one direction map is given, each pixel is split into 2 x 2 subpixels: one
+    direction fills all subpixels, two directions are shown on the diagonals and three directions in the top left,
+    top right and bottom left subpixel. Unit vectors can be converted with 'direction_angles' first.
+
+    Parameters
+    ----------
+    directions: 2D direction map or 3D NumPy array with up to three direction maps in the last axis (degrees).
+    weights: 2D NumPy array which scales the brightness of each pixel. The weights are divided by their maximum.
+    Negative and undefined weights result in black pixels. If None, all pixels have full brightness.
+    background_value: Direction angle of pixels without direction.
+    path: If not None, the image will be written to this file. TIFF files are written with tifffile, all other
+    formats (e.g. .png) with Pillow.
+
+    Returns
+    -------
+    RGB image as uint8 NumPy array with the shape [x, y, 3] for a single direction map or [2x, 2y, 3] for multiple
+    direction maps.
+    """
+    directions = numpy.asarray(directions, dtype=float)
+    single_direction = directions.ndim == 2
+    if single_direction:
+        directions = directions[..., numpy.newaxis]
+    if directions.shape[-1] > 3:
+        raise ValueError('At most three direction maps are supported.')
+
+    defined = numpy.logical_and(numpy.isfinite(directions), ~numpy.isclose(directions, background_value))
+    if weights is None:
+        value = numpy.ones(directions.shape[:2], dtype=numpy.float32)
+    else:
+        weights = numpy.nan_to_num(numpy.asarray(weights, dtype=numpy.float32), nan=0, posinf=0, neginf=0)
+        maximum = weights.max(initial=0)
+        value = numpy.clip(weights / maximum, 0, 1) if maximum > 0 else numpy.zeros_like(weights)
+    # HSV to RGB conversion for full saturation. Pixels without direction have no brightness.
+    hue = (directions.astype(numpy.float32) % 180) / 30
+    value = numpy.where(defined, value[..., numpy.newaxis], 0)
+    # RGB values with an unused fourth byte so that each color can be handled as one uint32 value. The additional
+    # direction at the end is black.
+    rgb = numpy.zeros(directions.shape[:2] + (directions.shape[-1] + 1, 4), dtype=numpy.uint8)
+    rgb[:, :, :-1, 0] = numpy.round(255 * value * numpy.clip(numpy.abs(hue - 3) - 1, 0, 1))
+    rgb[:, :, :-1, 1] = numpy.round(255 * value * numpy.clip(2 - numpy.abs(hue - 2), 0, 1))
+    rgb[:, :, :-1, 2] = numpy.round(255 * value * numpy.clip(2 - numpy.abs(hue - 4), 0, 1))
+
+    if single_direction:
+        image = numpy.ascontiguousarray(rgb[:, :, 0, :3])
+    else:
+        # Rank of each defined direction within its pixel, i.e. 0 for the first defined direction
+        rank = numpy.cumsum(defined, axis=-1) - 1
+        subpixels = SUBPIXEL_DIRECTIONS[rank[..., -1] + 1]
+        # Index of the direction shown in each subpixel
+        number_of_directions = directions.shape[-1]
+        subpixel_directions = numpy.full(subpixels.shape, number_of_directions)
+        for direction in range(number_of_directions):
+            selected = numpy.logical_and(defined[..., direction, numpy.newaxis],
+                                         subpixels == rank[..., direction, numpy.newaxis])
+            subpixel_directions[selected] = direction
+        image = numpy.take_along_axis(rgb.view(numpy.uint32)[..., 0], subpixel_directions, axis=-1)
+        x, y = image.shape[:2]
+        image = image.view(numpy.uint8).reshape((x, y, 2, 2, 4))[..., :3]
+        image = image.transpose((0, 2, 1, 3, 4)).reshape((2 * x, 2 * y, 3))
+
+    if path is not None:
+        if path.endswith('.tif') or path.endswith('.tiff'):
+            tifffile.imwrite(path, image, photometric='rgb')
+        else:
+            Image.fromarray(image).save(path)
+    return image
@@ -0,0 +1,73 @@
+from SLIX.cache import *
+import os
+
+import pytest
+
+
+class TestCache:
+    def test_file_hash(self, tmp_path):
+        first_path = tmp_path / 'first.bin'
+        second_path = tmp_path / 'second.bin'
+        first_path.write_bytes(b'SLIX' * 1000)
+        second_path.write_bytes(b'SLIX' * 1000)
+        assert file_hash(first_path) == file_hash(second_path)
+        second_path.write_bytes(b'SLIX' * 999)
+        assert file_hash(first_path) != file_hash(second_path)
+
+    def test_cache_key(self):
+        assert cache_key('hash', 1, True, 0.08) == cache_key('hash', 1, True, 0.08)
+        assert cache_key('hash', 1, True, 0.08) != cache_key('hash', 1, True, 0.09)
+        assert cache_key('hash', 1, False) != cache_key('hash', 1, None)
+
+    def test_store_and_load(self, tmp_path):
+        assert load(tmp_path, cache_key('missing')) is None
+        assert not contains(tmp_path, cache_key('missing'))
+        roiset = numpy.random.random((100, 24)).astype('float32')
+        parameter_maps = numpy.random.random((100, 12))
+        key = cache_key('roiset')
+        store(tmp_path, key, {'roiset': roiset, 'parameter_maps': parameter_maps})
+        assert contains(tmp_path, key)
+        entry = load(tmp_path, key)
+        assert entry['roiset'].dtype == roiset.dtype
+        assert numpy.all(entry['roiset'] == roiset)
+        assert numpy.all(entry['parameter_maps'] == parameter_maps)
+        # Storing the same entry again keeps the existing one
+        store(tmp_path, key, {'roiset': roiset})
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_evict(self, tmp_path):
+        array = numpy.zeros(1000)
+        keys = [cache_key(i) for i in range(3)]
+        for index, key in enumerate(keys):
+            store(tmp_path, key, {'array': array})
+            os.utime(tmp_path / key, (index, index))
+        size = entry_size(tmp_path, keys[0])
+        # Loading an entry marks it as recently used
+        load(tmp_path, keys[0])
+        evict(tmp_path, 2 * size)
+        assert sorted(os.listdir(tmp_path)) == sorted([keys[0], keys[2]])
+        store(tmp_path, cache_key(3), {'array': array}, max_size=size)
+        assert os.listdir(tmp_path) == [cache_key(3)]
+
+    def test_entry_writer(self, tmp_path):
+        parts = [numpy.random.random((rows, 6)) for rows in (10, 0, 7)]
+        key = cache_key('peak_table')
+        writer = EntryWriter(tmp_path, key)
+        for index, part in enumerate(parts):
+            writer.append({'window': part, 'pixel': numpy.full(len(part), index)})
+            # Incomplete entries are not visible
+            assert not contains(tmp_path, key)
+        with pytest.raises(ValueError):
+            writer.append({'window': numpy.zeros((1, 5))})
+        writer.finish({'profile_length': numpy.array(48)})
+        entry = load(tmp_path, key)
+        assert numpy.array_equal(entry['window'], numpy.concatenate(parts))
+        assert numpy.array_equal(entry['pixel'], [0] * 10 + [2] * 7)
+        assert entry['profile_length'] == 48
+        # The appended parts are removed
+        assert not any(name.endswith('.part') for name in os.listdir(tmp_path / key))
+
+        writer = EntryWriter(tmp_path, cache_key('aborted'))
+        writer.append({'window': parts[0]})
+        writer.abort()
+        assert os.listdir(tmp_path) == [key]
@@ -0,0 +1,68 @@
+import importlib.machinery
+import importlib.util
+import os
+
+import numpy
+import pytest
+import tifffile
+
+import SLIX.toolbox as toolbox
+
+
+def _load_script(name):
+    # The command line tools are scripts without an extension and have to be loaded from their path
+    path = os.path.join(os.path.dirname(__file__), '..', 'bin', name)
+    loader = importlib.machinery.SourceFileLoader(name, path)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+
+generator = _load_script('SLIXParameterGenerator')
+merge = _load_script('SLIXMergeShards')
+
+
+class TestMergeShards:
+    def test_merge_shards(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(toolbox, 'EXECUTION_BACKEND', 'serial')
+        monkeypatch.setattr(toolbox, 'PROGRESS_CALLBACK', toolbox.null_progress)
+        image = numpy.random.randint(100, 1000, (21, 15, 24)).astype(numpy.uint16)
+        path = str(tmp_path / 'stack.tiff')
+        tifffile.imwrite(path, numpy.moveaxis(image, -1, 0))
+        for directory in ['whole', 'shards', 'merged']:
+            os.makedirs(str(tmp_path / directory))
+
+        for shard in [None, (0, 3), (1, 3), (2, 3)]:
+            output = str(tmp_path / ('whole' if shard is None else 'shards') / 'stack')
+            generator.full_pipeline(path, output, 2, True, False, 10, PEAK_TABLE=True, SHARD=shard)
+            generator.full_pipeline(path, output + '_container', 2, True, False, 10, CONTAINER=True, SHARD=shard)
+        assert len(merge.find_shards(str(tmp_path / 'shards'))['stack_dir_1.tiff']) == 3
+        merge.merge_shards(str(tmp_path / 'shards'), str(tmp_path / 'merged'))
+
+        # The merged results are the same as the results of evaluating the whole measurement at once
+        names = sorted(os.listdir(str(tmp_path / 'whole')))
+        assert names == sorted(os.listdir(str(tmp_path / 'merged')))
+        for name in names:
+            expected_path = str(tmp_path / 'whole' / name)
+            merged_path = str(tmp_path / 'merged' / name)
+            if name.endswith('_peak_table'):
+                expected = toolbox.read_peak_table(expected_path)
+                merged = toolbox.read_peak_table(merged_path)
+                assert sorted(merged.keys()) == sorted(expected.keys())
+                for key in expected:
+                    assert numpy.array_equal(merged[key], expected[key], equal_nan=True)
+            elif name.endswith('_parameter_maps.tiff'):
+                assert toolbox.parameter_map_names(merged_path) == toolbox.parameter_map_names(expected_path)
+                for map_name in toolbox.parameter_map_names(expected_path):
+                    assert numpy.array_equal(toolbox.read_parameter_map(merged_path, map_name),
+                                             toolbox.read_parameter_map(expected_path, map_name), equal_nan=True)
+            else:
+                assert merge.roisize_of(merged_path) == 2
+                assert numpy.array_equal(tifffile.imread(merged_path), tifffile.imread(expected_path),
+                                         equal_nan=True)
+
+        os.remove(str(tmp_path / 'shards' / 'stack_shard_1_of_3_dir_1.tiff'))
+        with pytest.raises(ValueError):
+            merge.merge_shards(str(tmp_path / 'shards'), str(tmp_path / 'merged'))
+        with pytest.raises(ValueError):
+            merge.merge_shards(str(tmp_path / 'whole'), str(tmp_path / 'merged'))
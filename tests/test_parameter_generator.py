@@ -0,0 +1,135 @@
+import importlib.machinery
+import importlib.util
+import os
+
+import numpy
+import tifffile
+
+import SLIX.toolbox as toolbox
+
+# The command line tools are scripts without an extension and have to be loaded from their path
+_path = os.path.join(os.path.dirname(__file__), '..', 'bin', 'SLIXParameterGenerator')
+_loader = importlib.machinery.SourceFileLoader('SLIXParameterGenerator', _path)
+generator = importlib.util.module_from_spec(importlib.util.spec_from_loader(_loader.name, _loader))
+_loader.exec_module(generator)
+
+
+class UnreadableImage:
+    """
+    Image which only allows slicing rows. Reading any pixel fails.
+    """
+
+    def __init__(self, shape):
+        self.shape = shape
+
+    def __getitem__(self, index):
+        rows = range(self.shape[0])[index]
+        return UnreadableImage((len(rows),) + self.shape[1:])
+
+    def __array__(self, *args):
+        raise AssertionError('The image data was read.')
+
+    def reshape(self, *args):
+        raise AssertionError('The image data was read.')
+
+
+class TestParameterGenerator:
+    def test_cache_hit_does_not_read_image(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(toolbox, 'EXECUTION_BACKEND', 'serial')
+        monkeypatch.setattr(toolbox, 'PROGRESS_CALLBACK', toolbox.null_progress)
+        image = numpy.random.randint(100, 1000, (20, 15, 24)).astype(numpy.uint16)
+        path = str(tmp_path / 'stack.tiff')
+        tifffile.imwrite(path, numpy.moveaxis(image, -1, 0))
+        cache_dir = str(tmp_path / 'cache')
+        generator.full_pipeline(path, str(tmp_path / 'first'), 1, True, False, 10, CACHE_DIR=cache_dir)
+
+        monkeypatch.setattr(toolbox, 'read_image', lambda FILEPATH, lazy=False: UnreadableImage(image.shape))
+        generator.full_pipeline(path, str(tmp_path / 'second'), 1, True, False, 10, CACHE_DIR=cache_dir)
+        # Reading ahead skips the bands whose results are cached
+        bands = toolbox.prefetch(generator.read_bands([path], 1, READ_AHEAD=True, SKIP=lambda *band: True))
+        generator.full_pipeline(path, str(tmp_path / 'third'), 1, True, False, 10, CACHE_DIR=cache_dir, BANDS=bands)
+
+        for name in ['high_prominence_peaks', 'peakwidth', 'peakdistance', 'dir_1']:
+            expected = tifffile.imread(str(tmp_path / ('first_' + name + '.tiff')))
+            for output in ['second', 'third']:
+                result = tifffile.imread(str(tmp_path / (output + '_' + name + '.tiff')))
+                assert numpy.array_equal(result, expected, equal_nan=True)
+
+    def test_cache_reuse(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(toolbox, 'EXECUTION_BACKEND', 'serial')
+        monkeypatch.setattr(toolbox, 'PROGRESS_CALLBACK', toolbox.null_progress)
+        image = numpy.random.randint(100, 1000, (21, 15, 24)).astype(numpy.uint16)
+        # Background which is removed by the mask
+        image[:6, :5] = 1
+        path = str(tmp_path / 'stack.tiff')
+        tifffile.imwrite(path, numpy.moveaxis(image, -1, 0))
+        cache_dir = str(tmp_path / 'cache')
+        runs = {'sweep': dict(PROMINENCES=[0.05, 0.2], PEAK_HEIGHTS=[0.9, 0.94]),
+                'peak_table': dict(PEAK_TABLE=True, PROMINENCES=[0.05], PEAK_HEIGHTS=[toolbox.TARGET_PEAK_HEIGHT]),
+                'mask': dict(APPLY_MASK=True, MASK_THRESHOLD=10)}
+
+        # The cache is filled with bands of 4 image rows. The bands depend on the memory limit, the number of
+        # processes, the backend and whether the input and output run in the background.
+        monkeypatch.setattr(toolbox, 'tile_rows', lambda *args, **kwargs: 4)
+        generator.full_pipeline(path, str(tmp_path / 'first'), 2, False, False, 10, MAX_MEMORY=1,
+                                CACHE_DIR=cache_dir)
+        monkeypatch.setattr(toolbox, 'tile_rows', lambda *args, **kwargs: 6)
+        for name, parameters in runs.items():
+            parameters = dict(dict(APPLY_MASK=False, MASK_THRESHOLD=10), **parameters)
+            generator.full_pipeline(path, str(tmp_path / ('expected_' + name)), 2, APPLY_SMOOTHING=False,
+                                    MAX_MEMORY=1, **parameters)
+
+            # Other bands, thresholds and masks reuse the cached results without reading the image
+            with monkeypatch.context() as context:
+                context.setattr(toolbox, 'read_image', lambda FILEPATH, lazy=False: UnreadableImage(image.shape))
+                generator.full_pipeline(path, str(tmp_path / name), 2, APPLY_SMOOTHING=False, MAX_MEMORY=1,
+                                        CACHE_DIR=cache_dir, **parameters)
+
+            output_names = [file_name[len('expected_'):] for file_name in os.listdir(str(tmp_path))
+                            if file_name.startswith('expected_' + name) and file_name.endswith('.tiff')]
+            assert len(output_names) > 0
+            for output_name in output_names:
+                expected = tifffile.imread(str(tmp_path / ('expected_' + output_name)))
+                result = tifffile.imread(str(tmp_path / output_name))
+                assert numpy.array_equal(result, expected, equal_nan=True)
+
+        expected = toolbox.read_peak_table(str(tmp_path / 'expected_peak_table_peak_table'))
+        peak_table = toolbox.read_peak_table(str(tmp_path / 'peak_table_peak_table'))
+        assert sorted(peak_table.keys()) == sorted(expected.keys())
+        for name in expected:
+            assert numpy.array_equal(peak_table[name], expected[name], equal_nan=True)
+
+    def test_roisize_output(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(toolbox, 'EXECUTION_BACKEND', 'serial')
+        monkeypatch.setattr(toolbox, 'PROGRESS_CALLBACK', toolbox.null_progress)
+        # Neither the height nor the width is a multiple of the roisize
+        image = numpy.random.randint(100, 1000, (21, 15, 24)).astype(numpy.uint16)
+        path = str(tmp_path / 'stack.tiff')
+        tifffile.imwrite(path, numpy.moveaxis(image, -1, 0))
+        generator.full_pipeline(path, str(tmp_path / 'roi'), 2, False, False, 10)
+        generator.full_pipeline(path, str(tmp_path / 'upscaled'), 2, False, False, 10, UPSCALE=True)
+        writer = generator.BackgroundWriter()
+        try:
+            generator.full_pipeline(path, str(tmp_path / 'compressed'), 2, False, False, 10, WRITER=writer,
+                                    COMPRESSION='zlib')
+        finally:
+            writer.close()
+
+        for name in ['high_prominence_peaks', 'peakwidth', 'dir_1']:
+            with tifffile.TiffFile(str(tmp_path / ('roi_' + name + '.tiff'))) as tiff:
+                parameter_map = tiff.asarray()
+                assert tiff.shaped_metadata[0]['roisize'] == 2
+            assert parameter_map.shape == (11, 8)
+
+            # Each roi is repeated and cropped to the size of the input image
+            upscaled = tifffile.imread(str(tmp_path / ('upscaled_' + name + '.tiff')))
+            assert upscaled.shape == (21, 15)
+            expected = numpy.repeat(numpy.repeat(parameter_map, 2, axis=0), 2, axis=1)[:21, :15]
+            assert numpy.array_equal(upscaled, expected, equal_nan=True)
+
+            with tifffile.TiffFile(str(tmp_path / ('compressed_' + name + '.tiff'))) as tiff:
+                assert tiff.pages[0].compression == tifffile.TIFF.COMPRESSION.ADOBE_DEFLATE
+                assert tiff.shaped_metadata[0]['roisize'] == 2
+                assert numpy.array_equal(tiff.asarray(), parameter_map, equal_nan=True)
+        # The uncompressed temporary files are removed
+        assert not any(name.endswith('.tmp') for name in os.listdir(str(tmp_path)))
@@ -1,4 +1,5 @@
 from SLIX.toolbox import *
+import pytest
 
 
 class TestToolbox:
@@ -13,6 +14,16 @@ class TestToolbox:
         toolbox_peaks = all_peaks(arr)
         assert numpy.all(toolbox_peaks == real_peaks[1:])
 
+    def test_all_peaks_roiset(self):
+        # Random integer line profiles contain many plateaus which have to be handled like in all_peaks
+        roiset = numpy.random.randint(0, 4, size=(1000, 48))
+        roiset[0] = [0, 1, 0, 1, 0, 1, 0, 1, 0, 1, 0, 1] * 4
+        for cut_edges in [True, False]:
+            peak_mask = all_peaks_roiset(roiset, cut_edges)
+            assert peak_mask.shape == roiset.shape
+            for i in range(roiset.shape[0]):
+                assert numpy.all(numpy.flatnonzero(peak_mask[i]) == all_peaks(roiset[i], cut_edges))
+
     def test_peak_positions(self):
         # Create an absolute simple peak array
         arr = numpy.array([0, 1, 0, 0.07, 0, 1, 0, 0.07, 0, 1, 0])
@@ -52,6 +63,24 @@ class TestToolbox:
         toolbox_width = peakwidth(toolbox_peaks, test_arr, 24)
         assert toolbox_width == expected_width
 
+    def test_prominence_and_peakwidth_roiset(self):
+        roiset = numpy.random.randint(0, 8, size=(500, 48)).astype('float32')
+        roiset[0] = 0
+        peak_mask = all_peaks_roiset(roiset)
+
+        toolbox_prominences = peak_prominences_roiset(roiset, peak_mask)
+        toolbox_widths = peak_widths_roiset(roiset, peak_mask, prominence_data=toolbox_prominences)
+        toolbox_prominence = prominence_roiset(roiset, peak_mask)
+        toolbox_width = peakwidth_roiset(roiset, peak_mask, 24)
+        for i in range(roiset.shape[0]):
+            peaks = numpy.flatnonzero(peak_mask[i])
+            for toolbox_value, scipy_value in zip(toolbox_prominences, peak_prominences(roiset[i], peaks)):
+                assert numpy.all(toolbox_value[i][peaks] == scipy_value)
+            for toolbox_value, scipy_value in zip(toolbox_widths, peak_widths(roiset[i], peaks)):
+                assert numpy.all(toolbox_value[i][peaks] == scipy_value)
+            assert numpy.isclose(toolbox_prominence[i], prominence(peaks, roiset[i]))
+            assert numpy.isclose(toolbox_width[i], peakwidth(peaks, roiset[i], 24))
+
     def test_crossing_direction(self):
         # Test for one direction with 180°+-35° distance
         two_peak_arr = numpy.array([0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0])
@@ -117,6 +146,23 @@ class TestToolbox:
         toolbox_direction = non_crossing_direction(high_peaks, len(two_peak_arr))
         assert expected_direction == toolbox_direction
 
+    def test_direction_and_peakdistance_roiset(self):
+        peak_mask = numpy.random.random((500, 24)) < 0.15
+        peak_positions = (numpy.arange(24) + numpy.random.normal(0, 0.3, (500, 24))).astype(numpy.float32)
+        padded_positions, num_peaks = padded_peak_positions(peak_mask, peak_positions)
+        assert numpy.all(num_peaks == numpy.count_nonzero(peak_mask, axis=-1))
+
+        toolbox_distance = peakdistance_roiset(padded_positions, num_peaks, 24)
+        toolbox_non_crossing = non_crossing_direction_roiset(padded_positions, num_peaks, 24)
+        toolbox_crossing = crossing_direction_roiset(padded_positions, num_peaks, 24)
+        for i in range(peak_mask.shape[0]):
+            peaks = peak_positions[i][peak_mask[i]]
+            assert numpy.all(padded_positions[i, :num_peaks[i]] == peaks)
+            assert numpy.all(padded_positions[i, num_peaks[i]:] == BACKGROUND_COLOR)
+            assert numpy.isclose(toolbox_distance[i], peakdistance(peaks, 24), 0, 1e-4)
+            assert numpy.isclose(toolbox_non_crossing[i], non_crossing_direction(peaks, 24), 0, 1e-4)
+            assert numpy.all(numpy.isclose(toolbox_crossing[i], crossing_direction(peaks, 24), 0, 1e-4))
+
     def test_centroid_correction(self):
         # simple test case: one distinct peak
         test_array = numpy.array([0] * 9 + [1] + [0] * 14)
@@ -150,12 +196,290 @@ class TestToolbox:
         toolbox_centroid = centroid_correction(test_array, test_high_peaks)
         assert numpy.isclose(expected_centroid, toolbox_centroid, 1e-2, 1e-2)
 
+    def test_centroid_correction_roiset(self):
+        roiset = numpy.zeros((4, 24))
+        roiset[0, 9] = 1
+        roiset[1, 8:11] = [0.5, 1, 0.5]
+        roiset[2, 8:10] = [1, 1]
+        roiset[3, 8:11] = [1, 1, 1]
+        peak_mask = numpy.zeros(roiset.shape, dtype=bool)
+        peak_mask[[0, 1, 2, 3], [9, 9, 8, 8]] = True
+        expected_centroid = numpy.array([9, 9, 8.5, 9])
+
+        toolbox_centroid = centroid_correction_roiset(roiset, peak_mask)
+        assert numpy.all(toolbox_centroid[~peak_mask] == 0)
+        assert numpy.all(numpy.isclose(toolbox_centroid[peak_mask], expected_centroid, 1e-2, 1e-2))
+
+        # Compare with the sampled centroid calculation of single line profiles
+        x = numpy.linspace(0, 4 * numpy.pi, 48, endpoint=False)
+        roiset = numpy.cos(x[numpy.newaxis, :] + numpy.random.random((100, 1)) * numpy.pi) + \
+            0.1 * numpy.random.random((100, 48))
+        peak_mask = all_peaks_roiset(roiset)
+        selected_peaks, toolbox_centroid = accurate_peak_positions_roiset(peak_mask, roiset)
+        for i in range(roiset.shape[0]):
+            peaks = accurate_peak_positions(numpy.flatnonzero(peak_mask[i]), roiset[i])
+            assert numpy.all(numpy.isclose(toolbox_centroid[i][selected_peaks[i]], peaks, 0, 1e-2))
+
+    def test_parameter_maps_image(self):
+        x = numpy.linspace(0, 4 * numpy.pi, 48, endpoint=False)
+        roiset = numpy.cos(x[numpy.newaxis, :] + numpy.random.random((50, 1)) * numpy.pi) + \
+            0.5 * numpy.random.random((50, 48))
+        parameter_maps = parameter_maps_image(roiset, centroid_calculation=False)
+        assert list(parameter_maps.keys()) == list(PARAMETER_MAPS)
+        assert parameter_maps['dir'].shape == (50, 3)
+        num_peaks = num_peaks_image(roiset)
+        assert num_peaks.dtype == numpy.int32
+        assert num_peaks.shape == (50, 1)
+        assert numpy.all(num_peaks == parameter_maps['high_prominence_peaks'])
+
+        for i in range(roiset.shape[0]):
+            peaks = all_peaks(roiset[i])
+            low_peaks = accurate_peak_positions(peaks, roiset[i], 0, TARGET_PROMINENCE, False)
+            peaks = accurate_peak_positions(peaks, roiset[i], centroid_calculation=False)
+            assert parameter_maps['max'][i] == roiset[i].max()
+            assert parameter_maps['low_prominence_peaks'][i] == len(low_peaks)
+            assert parameter_maps['high_prominence_peaks'][i] == len(peaks)
+            assert numpy.isclose(parameter_maps['peakwidth'][i], peakwidth(peaks, roiset[i], 24))
+            assert numpy.isclose(parameter_maps['peakprominence'][i], prominence(peaks, roiset[i]))
+            assert numpy.isclose(parameter_maps['peakdistance'][i], peakdistance(peaks, 24))
+            assert numpy.isclose(parameter_maps['non_crossing_dir'][i], non_crossing_direction(peaks, 24))
+            assert numpy.all(numpy.isclose(parameter_maps['dir'][i], crossing_direction(peaks, 24)))
+
+        with pytest.raises(ValueError):
+            parameter_maps_image(roiset, ['unknown'])
+
+    def test_roiset_tiles(self):
+        image = numpy.random.random((20, 15, 24))
+        assert tile_rows(image.shape) == 20
+        rows = tile_rows(image.shape, 3, CPU_COUNT * CHUNK_SIZE * 48 * BYTES_PER_CHUNK_SAMPLE + 20000)
+        assert rows % 3 == 0 and 0 < rows < 20
+        # Bands held in memory in addition to the evaluated one make the bands smaller
+        max_memory = CPU_COUNT * CHUNK_SIZE * 48 * BYTES_PER_CHUNK_SAMPLE + 100000
+        rows = tile_rows(image.shape, 3, max_memory)
+        buffered_rows = tile_rows(image.shape, 3, max_memory, 2)
+        assert buffered_rows % 3 == 0 and 0 < buffered_rows < rows
+        with pytest.raises(ValueError):
+            tile_rows(image.shape, 1, 1)
+
+        for ROISIZE in [1, 3]:
+            roiset = create_roiset(image, ROISIZE)
+            tiles = list(roiset_tiles(image, ROISIZE, CPU_COUNT * CHUNK_SIZE * 48 * BYTES_PER_CHUNK_SAMPLE + 20000))
+            assert len(tiles) > 1
+            assert tiles[0][0] == 0 and tiles[-1][1] == 20
+            assert numpy.all(numpy.concatenate([tile[2] for tile in tiles]) == roiset)
+
+    def test_shard_rows(self):
+        for image_shape, ROISIZE, number_of_shards in [((20, 15, 24), 1, 3), ((20, 15, 24), 3, 7), ((21, 5, 24), 4, 2)]:
+            shards = [shard_rows(image_shape, shard, number_of_shards, ROISIZE) for shard in range(number_of_shards)]
+            assert shards[0][0] == 0 and shards[-1][1] == image_shape[0]
+            for (_, row_stop), (row_start, _) in zip(shards[:-1], shards[1:]):
+                assert row_stop == row_start and row_start % ROISIZE == 0
+            assert all(row_start < row_stop for row_start, row_stop in shards)
+        with pytest.raises(ValueError):
+            shard_rows((20, 15, 24), 0, 8, 3)
+        with pytest.raises(ValueError):
+            shard_rows((20, 15, 24), 3, 3)
+
+    def test_read_image_lazy(self, tmp_path):
+        image = (numpy.random.random((24, 10, 8)) * 1000).astype(numpy.uint16)
+        tifffile.imwrite(str(tmp_path / 'stack.tiff'), image)
+        nibabel.save(nibabel.Nifti1Image(numpy.moveaxis(image, 0, -1).swapaxes(0, 1), numpy.eye(4)),
+                     str(tmp_path / 'stack.nii'))
+
+        for file_name in ['stack.tiff', 'stack.nii']:
+            expected_image = read_image(str(tmp_path / file_name))
+            lazy_image = read_image(str(tmp_path / file_name), lazy=True)
+            assert lazy_image.shape == (10, 8, 24)
+            assert lazy_image.dtype == numpy.uint16
+            assert numpy.all(lazy_image == expected_image)
+
+    def test_create_roiset(self):
+        image = (numpy.random.random((11, 7, 24)) * 1000).astype(numpy.uint16)
+        for ROISIZE in [2, 3, 5]:
+            roiset = create_roiset(image, ROISIZE)
+            ny = numpy.ceil(image.shape[1] / ROISIZE).astype('int')
+            assert roiset.shape == (numpy.ceil(image.shape[0] / ROISIZE).astype('int') * ny, 48)
+            for i in range(0, image.shape[0], ROISIZE):
+                for j in range(0, image.shape[1], ROISIZE):
+                    roi = image[i:i + ROISIZE, j:j + ROISIZE, :]
+                    expected_roi = numpy.average(numpy.average(roi, axis=1), axis=0)
+                    expected_roi = numpy.concatenate((expected_roi[-12:], expected_roi, expected_roi[:12]))
+                    assert numpy.all(numpy.isclose(roiset[(i // ROISIZE) * ny + j // ROISIZE], expected_roi))
+
+    def test_extend_roiset(self):
+        for number_of_measurements in [24, 25]:
+            image = numpy.random.random((6, 5, number_of_measurements))
+            roiset = create_roiset(image, 1, extend=False)
+            assert numpy.shares_memory(roiset, image)
+            extended_roiset = extend_roiset(roiset)
+            assert extended_roiset.shape == (30, 2 * number_of_measurements)
+            assert numpy.all(extended_roiset == create_roiset(image))
+            for i in range(roiset.shape[0]):
+                roi = roiset[i]
+                expected_roi = numpy.concatenate((roi[-number_of_measurements // 2:], roi,
+                                                  roi[:number_of_measurements // 2])).astype('float32')
+                assert numpy.all(extended_roiset[i] == expected_roi)
+
+    def test_execution_backends(self):
+        image = numpy.random.random((13, 11, 24)) * 1000
+        expected_roiset = create_roiset(image, 3, backend='serial')
+        expected_smoothed_roiset = smooth_roiset(expected_roiset, 9, 2, backend='serial')
+        expected_parameter_maps = parameter_maps_image(expected_smoothed_roiset, backend='serial')
+        for backend in ['process', 'thread']:
+            roiset = create_roiset(image, 3, backend=backend)
+            assert numpy.all(roiset == expected_roiset)
+            smoothed_roiset = smooth_roiset(roiset, 9, 2, backend=backend)
+            assert numpy.all(smoothed_roiset == expected_smoothed_roiset)
+            parameter_maps = parameter_maps_image(smoothed_roiset, backend=backend)
+            for name in PARAMETER_MAPS:
+                assert numpy.all(parameter_maps[name] == expected_parameter_maps[name])
+
+        with pytest.raises(ValueError):
+            parallel_for(print, 0, 1, backend='unknown')
+
+    def test_parameter_maps_image_mask(self):
+        roiset = numpy.random.random((2500, 24)) * 1000
+        mask = numpy.random.random(2500) < 0.5
+        masked_roiset = roiset.copy()
+        masked_roiset[mask, :] = 0
+        expected_parameter_maps = parameter_maps_image(masked_roiset, extend=True)
+        parameter_maps = parameter_maps_image(roiset, extend=True, mask=mask)
+        for name in PARAMETER_MAPS:
+            assert numpy.array_equal(parameter_maps[name], expected_parameter_maps[name])
+        assert numpy.all(parameter_maps['dir'][mask] == BACKGROUND_COLOR)
+
+        parameter_maps = parameter_maps_image(roiset, ['max', 'dir'], extend=True, mask=numpy.ones(2500, dtype=bool))
+        assert numpy.all(parameter_maps['max'] == 0)
+        assert numpy.all(parameter_maps['dir'] == BACKGROUND_COLOR)
+
+    def test_parameter_maps_sweep_image(self):
+        import SLIX.toolbox
+        roiset = numpy.random.random((1500, 24)) * 1000
+        low_prominences = [0.05, 0.08, 0.2]
+        target_peak_heights = [0.9, 0.94]
+        sweep = parameter_maps_sweep_image(roiset, low_prominences, target_peak_heights, extend=True)
+        assert list(sweep.keys()) == [(low_prominence, target_peak_height) for low_prominence in low_prominences
+                                      for target_peak_height in target_peak_heights]
+        target_peak_height = SLIX.toolbox.TARGET_PEAK_HEIGHT
+        try:
+            for (low_prominence, SLIX.toolbox.TARGET_PEAK_HEIGHT), parameter_maps in sweep.items():
+                expected_parameter_maps = parameter_maps_image(roiset, low_prominence=low_prominence, extend=True)
+                for name in PARAMETER_MAPS:
+                    assert numpy.array_equal(parameter_maps[name], expected_parameter_maps[name])
+        finally:
+            SLIX.toolbox.TARGET_PEAK_HEIGHT = target_peak_height
+
+    def test_peak_table(self, tmp_path):
+        roiset = numpy.random.random((2500, 24)) * 1000
+        mask = numpy.random.random(2500) < 0.2
+        peak_table = peak_table_image(roiset, extend=True, mask=mask)
+        offsets = peak_table['offsets']
+        assert len(offsets) == 2501
+        assert numpy.all(numpy.diff(offsets)[mask] == 0)
+        for name in PEAK_TABLE_FIELDS:
+            assert len(peak_table[name]) == offsets[-1]
+
+        extended_roiset = extend_roiset(roiset)
+        for i in numpy.flatnonzero(~mask)[:20]:
+            peaks = peak_table['position'][offsets[i]:offsets[i + 1]]
+            assert numpy.all(peaks == all_peaks(extended_roiset[i]))
+            expected_prominence = peak_prominences(normalize(extended_roiset[i]), peaks)[0]
+            assert numpy.all(numpy.isclose(peak_table['prominence'][offsets[i]:offsets[i + 1]], expected_prominence))
+            expected_width = peak_widths(extended_roiset[i], peaks)[0]
+            assert numpy.all(numpy.isclose(peak_table['width'][offsets[i]:offsets[i + 1]], expected_width))
+
+        expected_parameter_maps = parameter_maps_image(roiset, extend=True, mask=mask)
+        write_peak_table(tmp_path / 'peak_table', peak_table)
+        for table in [peak_table, read_peak_table(tmp_path / 'peak_table'),
+                      concatenate_peak_tables([peak_table_image(roiset[:1000], extend=True, mask=mask[:1000]),
+                                               peak_table_image(roiset[1000:], extend=True, mask=mask[1000:])])]:
+            parameter_maps = parameter_maps_peak_table(table)
+            for name in PARAMETER_MAPS:
+                assert numpy.all(numpy.isclose(parameter_maps[name], expected_parameter_maps[name]))
+
+    def test_parameter_maps_sweep_peak_table(self):
+        roiset = numpy.random.random((1500, 24)) * 1000
+        low_prominences = [0.05, 0.08, 0.2]
+        target_peak_heights = [0.9, 0.94]
+        peak_table = peak_table_image(roiset, extend=True, centroid_windows=True)
+        for name in CENTROID_WINDOW_FIELDS:
+            assert peak_table[name].shape == (peak_table['offsets'][-1], 6)
+        expected_sweep = parameter_maps_sweep_image(roiset, low_prominences, target_peak_heights, extend=True)
+        sweep = parameter_maps_sweep_peak_table(peak_table, low_prominences, target_peak_heights)
+        assert list(sweep.keys()) == list(expected_sweep.keys())
+        for threshold, parameter_maps in sweep.items():
+            for name in PARAMETER_MAPS:
+                assert numpy.all(numpy.isclose(parameter_maps[name], expected_sweep[threshold][name]))
+
+        expected_peak_table = peak_table_image(roiset, low_prominence=0.2, extend=True)
+        assert numpy.array_equal(corrected_peak_positions(peak_table, low_prominence=0.2),
+                                 expected_peak_table['corrected_position'], equal_nan=True)
+        with pytest.raises(ValueError):
+            parameter_maps_sweep_peak_table(expected_peak_table)
+
+    def test_numba_peak_evaluation(self):
+        pytest.importorskip('numba')
+        import SLIX.toolbox
+        roiset = numpy.random.random((2000, 48))
+        # Plateaus have to be handled exactly like in the NumPy implementation
+        roiset[:200] = numpy.round(roiset[:200] * 3)
+        use_numba = SLIX.toolbox.USE_NUMBA
+        try:
+            SLIX.toolbox.USE_NUMBA = False
+            expected_parameter_maps = parameter_maps_image(roiset, extend=True)
+            SLIX.toolbox.USE_NUMBA = True
+            parameter_maps = parameter_maps_image(roiset, extend=True)
+        finally:
+            SLIX.toolbox.USE_NUMBA = use_numba
+        for name in PARAMETER_MAPS:
+            assert numpy.array_equal(parameter_maps[name], expected_parameter_maps[name], equal_nan=True)
+
+    def test_progress_callback(self):
+        roiset = numpy.random.random((2500, 48))
+        for backend in EXECUTION_BACKENDS:
+            events = []
+            parameter_maps_image(roiset, ['max'], backend=backend,
+                                 progress_callback=lambda stage, done, total: events.append((stage, done, total)))
+            assert events[0] == ('Parameter maps', 0, 2500)
+            assert events[-1] == ('Parameter maps', 2500, 2500)
+            assert all(events[i][1] <= events[i + 1][1] for i in range(len(events) - 1))
+
+    def test_prefetch(self):
+        assert list(prefetch(range(100), depth=3)) == list(range(100))
+        assert list(prefetch([])) == []
+
+        def failing_items():
+            yield 1
+            raise ValueError('Read error')
+
+        items = prefetch(failing_items())
+        assert next(items) == 1
+        with pytest.raises(ValueError):
+            next(items)
+
+        # Stopping the iteration early must not block the background thread
+        for item in prefetch(range(100)):
+            if item == 10:
+                break
+
     def test_create_background_mask(self):
         test_array = (numpy.random.random(10000) * 256).astype('int')
         expected_results = test_array < 10
         toolbox_mask = create_background_mask(test_array[..., numpy.newaxis])
         assert numpy.all(expected_results == toolbox_mask)
 
+    def test_smooth_roiset(self):
+        image = numpy.random.random((10, 8, 24)) * 1000
+        roiset = create_roiset(image)
+        smoothed_roiset = smooth_roiset(roiset, 9, 2)
+        for i in range(roiset.shape[0]):
+            roi = roiset[i]
+            expected_roi = savgol_filter(numpy.concatenate((roi, roi, roi)), 9, 2)[len(roi):-len(roi)]
+            assert numpy.all(numpy.isclose(smoothed_roiset[i], expected_roi, 1e-5, 1e-3))
+        # Smoothing before the extension results in the same line profiles
+        assert numpy.all(numpy.isclose(smooth_roiset(create_roiset(image, extend=False), 9, 2, extend=True),
+                                       smoothed_roiset, 1e-5, 1e-3))
+
     def test_normalize(self):
         test_array = numpy.array([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10], dtype=numpy.float)
         # Normalization kind == 0 -> Scale to 0..1
@@ -167,6 +491,15 @@ class TestToolbox:
         normalized_array = normalize(test_array, kind_of_normalization=1)
         assert numpy.all(numpy.isclose(expected_array, normalized_array))
 
+    def test_normalize_roiset(self):
+        test_roiset = numpy.array([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+                                   [5] * 11,
+                                   [0] * 11])
+        for kind_of_normalization in [0, 1]:
+            normalized_roiset = normalize_roiset(test_roiset, kind_of_normalization)
+            for i in range(test_roiset.shape[0]):
+                assert numpy.all(normalized_roiset[i] == normalize(test_roiset[i], kind_of_normalization))
+
     def test_reshape_array_to_image(self):
         test_array = numpy.array([i for i in range(0, 100)])
 
@@ -185,4 +518,32 @@ class TestToolbox:
 
         for i in range(0, 5):
             for j in range(0, 20):
-                assert toolbox_image[i, j] == test_array[i * 20 + j]
\ No newline at end of file
+                assert toolbox_image[i, j] == test_array[i * 20 + j]
+
+    def test_parameter_map_container(self, tmp_path):
+        path = str(tmp_path / 'parameter_maps.tiff')
+        direction = numpy.random.uniform(0, 180, (100, 70)).astype('float32')
+        peaks = numpy.random.randint(0, 12, (100, 70)).astype('int32')
+        write_parameter_maps(path, {'dir_1': direction, 'low_prominence_peaks': peaks}, roisize=2, tile_size=32)
+        assert parameter_map_names(path) == ['dir_1', 'low_prominence_peaks']
+
+        import SLIX.toolbox
+        installed_zarr = SLIX.toolbox.zarr
+        try:
+            # Reading single tiles with zarr has to give the same results as decoding whole parameter maps
+            for module in [None] + ([installed_zarr] if installed_zarr is not None else []):
+                SLIX.toolbox.zarr = module
+                parameter_map = read_parameter_map(path, 'low_prominence_peaks')
+                assert parameter_map.dtype == numpy.int8
+                assert numpy.all(parameter_map == peaks)
+                parameter_map = read_parameter_map(path, 'dir_1')
+                assert parameter_map.dtype == numpy.float32
+                assert numpy.all(parameter_map == direction)
+                # Regions spanning several tiles and regions at the image border
+                assert numpy.all(read_parameter_map(path, 'dir_1', slice(20, 90), slice(30, 40)) ==
+                                 direction[20:90, 30:40])
+                assert numpy.all(read_parameter_map(path, 'dir_1', slice(-5, None)) == direction[-5:])
+                with pytest.raises(ValueError):
+                    read_parameter_map(path, 'peakwidth')
+        finally:
+            SLIX.toolbox.zarr = installed_zarr
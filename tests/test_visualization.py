@@ -0,0 +1,74 @@
+from SLIX.visualization import *
+import matplotlib
+import numpy
+
+matplotlib.use('Agg')
+
+
+class TestVisualization:
+    def test_downsample(self):
+        image = numpy.random.random((23, 17, 3))
+        image[numpy.random.random(image.shape) < 0.4] = -1
+        for kernel_size in [1, 2, 5]:
+            for background_threshold in [0.2, 0.5]:
+                small_image = downsample(image, kernel_size, background_threshold=background_threshold)
+                assert small_image.shape == (numpy.ceil(23 / kernel_size), numpy.ceil(17 / kernel_size), 3)
+                for i in range(small_image.shape[0]):
+                    for j in range(small_image.shape[1]):
+                        for k in range(3):
+                            roi = image[i * kernel_size:(i + 1) * kernel_size, j * kernel_size:(j + 1) * kernel_size, k]
+                            if numpy.count_nonzero(roi == -1) < background_threshold * roi.size:
+                                expected_value = numpy.median(roi[roi != -1])
+                            else:
+                                expected_value = -1
+                            assert numpy.isclose(small_image[i, j, k], expected_value)
+
+        small_image = downsample(image[:, :, 0], 2)
+        assert small_image.shape == (12, 9)
+        assert numpy.all(small_image == downsample(image, 2)[:, :, 0])
+
+    def test_visualize_unit_vectors(self):
+        directions = numpy.random.uniform(0, 180, (40, 30, 3))
+        directions[numpy.random.random(directions.shape) < 0.3] = -1
+        UnitX, UnitY = unit_vectors(directions)
+        for thinout in [1, 4]:
+            fig, ax = plt.subplots(1, 1)
+            visualize_unit_vectors(UnitX, UnitY, thinout=thinout, ax=ax, rasterized=True)
+            assert len(ax.collections) == 1
+            lines = ax.collections[0]
+            assert lines.get_rasterized()
+            segments = numpy.array(lines.get_segments())
+            small_unit_x = downsample(UnitX, thinout, background_value=0) if thinout > 1 else UnitX
+            assert len(segments) == numpy.count_nonzero(small_unit_x)
+            # All vectors have a length of thinout and are placed on the downsampled grid
+            assert numpy.allclose(numpy.linalg.norm(segments[:, 1] - segments[:, 0], axis=-1), thinout)
+            positions = segments.mean(axis=1)
+            assert numpy.allclose(positions, numpy.round(positions / thinout) * thinout)
+            plt.close(fig)
+
+    def test_direction_angles(self):
+        directions = numpy.random.uniform(0, 180, (10, 10, 3))
+        directions[numpy.random.random(directions.shape) < 0.3] = -1
+        assert numpy.allclose(direction_angles(*unit_vectors(directions)), directions)
+
+    def test_fiber_orientation_map(self, tmp_path):
+        directions = numpy.array([[0, 60, 120, -1]])
+        image = fiber_orientation_map(directions)
+        assert image.dtype == numpy.uint8
+        assert numpy.all(image == [[[255, 0, 0], [0, 255, 0], [0, 0, 255], [0, 0, 0]]])
+        # The brightness is scaled by the weights
+        image = fiber_orientation_map(directions, weights=numpy.array([[1, 2, 4, 4]]))
+        assert numpy.all(image[0, :3].max(axis=-1) == [64, 128, 255])
+
+        # Multiple directions are shown in 2 x 2 subpixels
+        directions = numpy.array([[[30, -1, -1], [-1, 0, 60], [0, 60, 120], [-1, -1, -1]]])
+        image = fiber_orientation_map(directions, path=str(tmp_path / 'orientation.png'))
+        assert image.shape == (2, 8, 3)
+        assert numpy.all(image[:, :2] == [255, 255, 0])
+        assert numpy.all(image[:, 2:4] == [[[255, 0, 0], [0, 255, 0]], [[0, 255, 0], [255, 0, 0]]])
+        assert numpy.all(image[:, 4:6] == [[[255, 0, 0], [0, 255, 0]], [[0, 0, 255], [0, 0, 0]]])
+        assert numpy.all(image[:, 6:] == 0)
+        assert numpy.all(numpy.array(Image.open(str(tmp_path / 'orientation.png'))) == image)
+
+        fiber_orientation_map(directions, path=str(tmp_path / 'orientation.tiff'))
+        assert numpy.all(tifffile.imread(str(tmp_path / 'orientation.tiff')) == image)